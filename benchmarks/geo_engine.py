@@ -0,0 +1,76 @@
+"""
+Сравнение in-memory движка (NumPy) и SQL-условий для поиска по радиусу и прямоугольнику.
+
+Синтетические здания вставляются в транзакции, которая в конце откатывается:
+
+    PYTHONPATH=src python benchmarks/geo_engine.py
+"""
+import asyncio
+import sys
+import time
+
+sys.path.append("src/")
+
+from sqlalchemy import select, text
+
+from cache.building_geo_index import BuildingGeoIndex
+from db.database import async_session_maker
+from db.models import Building
+from repositories.organization import OrganizationRepository
+
+SIZE = 1_000_000
+REPEATS = 50
+RADIUS_QUERIES = [(55.75, 37.62, 1), (55.75, 37.62, 10), (55.75, 37.62, 100)]
+RECTANGLE_QUERIES = [(55.70, 55.80, 37.55, 37.70), (55.0, 56.5, 36.5, 38.5)]
+
+
+def timed(func_, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func_(*args)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+async def timed_sql(session, stmt) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        (await session.execute(stmt)).all()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+async def main():
+    repository = OrganizationRepository()
+
+    async with async_session_maker() as session:
+        try:
+            await session.execute(text("""
+                INSERT INTO buildings (address, latitude, longitude)
+                SELECT 'bench ' || g, 45.75 + random() * 20, 27.62 + random() * 20
+                FROM generate_series(1, :size) AS g
+            """), {"size": SIZE})
+            await session.execute(text("ANALYZE buildings"))
+
+            started = time.perf_counter()
+            index = await BuildingGeoIndex(ttl=float("inf")).load(session)
+            print(f"index load: {(time.perf_counter() - started) * 1000:.0f} ms, {len(index.ids)} buildings")
+
+            ids_stmt = select(Building.id)
+            for latitude, longitude, radius_km in RADIUS_QUERIES:
+                sql = await timed_sql(
+                    session, ids_stmt.where(repository._radius_condition(latitude, longitude, radius_km))
+                )
+                numpy = timed(index.within_radius, latitude, longitude, radius_km)
+                print(f"radius {radius_km:>4} km: sql={sql:8.2f} ms  numpy={numpy:8.3f} ms")
+
+            for rectangle in RECTANGLE_QUERIES:
+                sql = await timed_sql(session, ids_stmt.where(repository._rectangle_condition(*rectangle)))
+                min_lat, max_lat, min_lon, max_lon = rectangle
+                center = ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+                numpy = timed(index.within_rectangle, *rectangle, *center)
+                print(f"rectangle {rectangle}: sql={sql:8.2f} ms  numpy={numpy:8.3f} ms")
+        finally:
+            await session.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Бенчмарк поиска по радиусу на синтетических зданиях.
+
+Данные вставляются внутри транзакции, которая в конце откатывается,
+поэтому скрипт можно запускать на рабочей базе с применёнными миграциями:
+
+    PYTHONPATH=src python benchmarks/geo_radius.py
+"""
+import asyncio
+import sys
+import time
+
+sys.path.append("src/")
+
+from sqlalchemy import func, select, text
+
+from db.database import async_session_maker
+from db.models import Building
+from geo import bounding_boxes
+from repositories.organization import OrganizationRepository
+
+SIZES = (100_000, 1_000_000)
+RADII_KM = (1, 10, 100)
+CENTER = (55.75, 37.62)
+REPEATS = 20
+
+
+def legacy_condition(latitude: float, longitude: float, radius_km: float):
+    """Прежнее условие через acos(...) - полный перебор таблицы"""
+    return 6371 * func.acos(
+        func.cos(func.radians(latitude))
+        * func.cos(func.radians(Building.latitude))
+        * func.cos(func.radians(Building.longitude) - func.radians(longitude))
+        + func.sin(func.radians(latitude))
+        * func.sin(func.radians(Building.latitude))
+    ) <= radius_km
+
+
+def indexed_condition(latitude: float, longitude: float, radius_km: float):
+    return (
+        OrganizationRepository._bbox_condition(bounding_boxes(latitude, longitude, radius_km)),
+        OrganizationRepository._distance_expr(latitude, longitude) <= radius_km,
+    )
+
+
+async def timed(session, stmt) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        await session.execute(stmt)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+async def run_size(size: int):
+    async with async_session_maker() as session:
+        try:
+            # Равномерно по квадрату ~ 20x20 градусов вокруг центра
+            await session.execute(text("""
+                INSERT INTO buildings (address, latitude, longitude)
+                SELECT 'bench ' || g, 45.75 + random() * 20, 27.62 + random() * 20
+                FROM generate_series(1, :size) AS g
+            """), {"size": size})
+            await session.execute(text("ANALYZE buildings"))
+
+            for radius_km in RADII_KM:
+                count_stmt = select(func.count()).select_from(Building)
+                legacy = await timed(session, count_stmt.where(legacy_condition(*CENTER, radius_km)))
+                indexed = await timed(session, count_stmt.where(*indexed_condition(*CENTER, radius_km)))
+                print(
+                    f"rows={size:>9} radius={radius_km:>4} km "
+                    f"acos={legacy:8.2f} ms  bbox+haversine={indexed:8.2f} ms"
+                )
+        finally:
+            await session.rollback()
+
+
+async def main():
+    for size in SIZES:
+        await run_size(size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Чтение страницы из 100 организаций: ORM-сущности с selectinload против строк Core-запроса
+(OrganizationRepository._read_stmt). Считаются процессорное время и пик памяти Python
+на страницу - от выполнения запроса до готовых моделей ответа.
+
+Синтетические данные вставляются в транзакции, которая в конце откатывается:
+
+    PYTHONPATH=src python benchmarks/read_path.py
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+sys.path.append("src/")
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import selectinload
+
+from cache.activity_tree import ActivityTree
+from cache.query_cache import QueryCache
+from db.database import async_session_maker
+from db.models import Organization
+from repositories.organization import OrganizationRepository
+from schemas.building import BuildingResponse
+from schemas.organization import OrganizationResponse
+from services.organization import OrganizationService
+
+PAGE = 100
+REPEATS = 200
+
+
+async def orm_page(session, tree, after: int):
+    stmt = (
+        select(Organization)
+        .where(Organization.id > after)
+        .order_by(Organization.id)
+        .limit(PAGE)
+        .options(selectinload(Organization.building), selectinload(Organization.activities))
+    )
+    organizations = (await session.execute(stmt)).scalars().all()
+    page = [
+        OrganizationResponse(
+            id=organization.id,
+            name=organization.name,
+            building_id=organization.building_id,
+            phone_numbers=organization.phone_numbers,
+            building=BuildingResponse.model_validate(organization.building),
+            activities=[tree.render(activity.id, depth=1) for activity in organization.activities],
+        )
+        for organization in organizations
+    ]
+    # Как и в обработчике запроса: сессия живёт один запрос, identity map не копится
+    session.expunge_all()
+    return page
+
+
+async def core_page(session, tree, after: int):
+    # Меряем само чтение из БД, а не попадания в кэш запросов
+    repository = OrganizationRepository()
+    repository.cache = QueryCache(None)
+    rows = await repository.find_all(session, limit=PAGE, after=(after,))
+    return [OrganizationService._to_response(row, tree) for row in rows]
+
+
+async def measure(read_page, session, tree, after: int) -> tuple[float, float]:
+    await read_page(session, tree, after)
+
+    started = time.process_time()
+    for _ in range(REPEATS):
+        await read_page(session, tree, after)
+    cpu_ms = (time.process_time() - started) / REPEATS * 1000
+
+    tracemalloc.start()
+    await read_page(session, tree, after)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024
+
+
+async def main():
+    async with async_session_maker() as session:
+        try:
+            building_id = (await session.execute(text("""
+                INSERT INTO buildings (address, latitude, longitude)
+                VALUES ('bench read path', 55.75, 37.62) RETURNING id
+            """))).scalar_one()
+            activity_ids = (await session.execute(text("""
+                INSERT INTO activities (name, level)
+                SELECT 'bench ' || g, 1 FROM generate_series(1, 3) AS g RETURNING id
+            """))).scalars().all()
+            first_id = (await session.execute(text("""
+                INSERT INTO organizations (name, building_id, phone_numbers)
+                SELECT 'bench ' || g, :building_id, ARRAY['8-923-666-13-13', '2-222-222']
+                FROM generate_series(1, :size) AS g RETURNING id
+            """), {"building_id": building_id, "size": PAGE})).scalars().all()[0]
+            await session.execute(text("""
+                INSERT INTO organization_activity (organization_id, activity_id)
+                SELECT organizations.id, activity_id
+                FROM organizations, unnest(CAST(:activity_ids AS integer[])) AS activity_id
+                WHERE organizations.id >= :first_id
+            """), {"activity_ids": activity_ids, "first_id": first_id})
+
+            tree = await ActivityTree(ttl=float("inf")).load(session)
+
+            for name, read_page in (("orm", orm_page), ("core", core_page)):
+                cpu_ms, peak_kb = await measure(read_page, session, tree, first_id - 1)
+                print(f"{name:>4}: cpu={cpu_ms:7.2f} ms/page  peak={peak_kb:8.1f} KiB/page")
+        finally:
+            await session.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
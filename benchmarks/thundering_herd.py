@@ -0,0 +1,83 @@
+"""
+Нагрузочный тест «толпы»: CLIENTS одновременных одинаковых запросов к одному окну карты
+и к одной странице деятельности. Считаются запросы в БД без схлопывания чтений
+и со схлопыванием (OrganizationService.single_flight). Кэш запросов выключен,
+проверки версий для ETag (table_versions) считаются отдельно - они идут на каждый запрос.
+
+Нужна БД с данными (например, после seed):
+
+    PYTHONPATH=src python benchmarks/thundering_herd.py
+"""
+import asyncio
+import sys
+import time
+
+sys.path.append("src/")
+
+import httpx
+from asgi_lifespan import LifespanManager
+from sqlalchemy import event
+
+from cache.query_cache import query_cache
+from config import settings
+from db.database import async_session_maker
+from main import app
+from services.organization import OrganizationService
+from services.single_flight import single_flight
+
+CLIENTS = 500
+URLS = [
+    "/api/v1/organizations/within_rectangle?min_lat=55.5&max_lat=56.0&min_lon=37.3&max_lon=37.9&limit=50",
+    "/api/v1/organizations?activity_id=1&include_subactivities=true&limit=50",
+]
+
+
+class StatementCounter:
+
+    def __init__(self):
+        self.queries = 0
+        self.version_checks = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if "table_versions" in statement:
+            self.version_checks += 1
+        else:
+            self.queries += 1
+
+
+async def herd(client: httpx.AsyncClient, url: str) -> float:
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.get(url) for _ in range(CLIENTS)))
+    assert all(response.status_code == 200 for response in responses), url
+    return time.perf_counter() - started
+
+
+async def main():
+    # Меряем только схлопывание: повторные чтения не должны отвечаться из кэша
+    query_cache.backend = None
+    engine = async_session_maker.kw["bind"].sync_engine
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://bench",
+                headers={"Authorization": f"Bearer {settings.api_key}"},
+                timeout=None,
+        ) as client:
+            for mode, flight in (("off", None), ("on", single_flight)):
+                OrganizationService.single_flight = flight
+                for url in URLS:
+                    counter = StatementCounter()
+                    event.listen(engine, "before_cursor_execute", counter)
+                    try:
+                        elapsed = await herd(client, url)
+                    finally:
+                        event.remove(engine, "before_cursor_execute", counter)
+                    print(
+                        f"single_flight={mode:>3}  {CLIENTS} clients  queries={counter.queries:5d}"
+                        f"  version_checks={counter.version_checks:5d}  {elapsed:6.2f} s  {url}"
+                    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,25 +1,39 @@
 from fastapi import APIRouter, Depends, Query
+from pydantic import TypeAdapter
+from conditional import ConditionalGet
+from config import settings
+from db.models import Activity
 from depends import verify_api_key
 from schemas.activity import ActivityResponse
+from serialization import page_response
 from typing import List, Annotated
 from services.activity import ActivityService
 from depends import get_activity_service
 
 
 router = APIRouter(
-    dependencies=[Depends(verify_api_key)]
+    dependencies=[
+        Depends(verify_api_key),
+        Depends(ConditionalGet(tables=(Activity.__tablename__,), cache_control=settings.cache_control_activities)),
+    ]
 )
 
+ACTIVITIES = TypeAdapter(List[ActivityResponse])
+
+
 @router.get("/activities", response_model=List[ActivityResponse])
 async def get_activities(
     activity_service: Annotated[ActivityService, Depends(get_activity_service)], # noqa
 
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-) -> List[ActivityResponse]:
+    cursor: str | None = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+):
     """
-    Возвращает список активностей для наглядности
+    Возвращает список активностей для наглядности.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
 
     :return: List[ActivityResponse]
     """
-    return await activity_service.get_activities(limit, offset)
+    page = await activity_service.get_activities(limit, offset, cursor)
+    return page_response(ACTIVITIES, page)
@@ -1,25 +1,39 @@
 from fastapi import APIRouter, Depends, Query
+from pydantic import TypeAdapter
+from conditional import ConditionalGet
+from config import settings
+from db.models import Building
 from depends import verify_api_key
 from schemas.building import BuildingResponse
+from serialization import page_response
 from typing import List, Annotated
 from services.building import BuildingService
 from depends import get_building_service
 
 
 router = APIRouter(
-    dependencies=[Depends(verify_api_key)]
+    dependencies=[
+        Depends(verify_api_key),
+        Depends(ConditionalGet(tables=(Building.__tablename__,), cache_control=settings.cache_control_buildings)),
+    ]
 )
 
+BUILDINGS = TypeAdapter(List[BuildingResponse])
+
+
 @router.get("/buildings", response_model=List[BuildingResponse])
 async def get_buildings(
     building_service: Annotated[BuildingService, Depends(get_building_service)], # noqa
 
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-) -> List[BuildingResponse]:
+    cursor: str | None = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+):
     """
-    Возвращает список активностей для наглядности
+    Возвращает список активностей для наглядности.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
 
     :return: List[BuildingResponse]
     """
-    return await building_service.get_buildings(limit, offset)
+    page = await building_service.get_buildings(limit, offset, cursor)
+    return page_response(BUILDINGS, page)
@@ -1,82 +1,197 @@
 from fastapi import APIRouter, Depends, Query
+from pydantic import TypeAdapter
 from typing import List, Annotated
 from services.organization import OrganizationService
+from conditional import ConditionalGet
+from config import settings
+from db.models import Activity, Building, Organization, organization_activity
 from depends import get_organization_service, verify_api_key
+from serialization import json_response, page_response
 from schemas.organization import (
     OrganizationResponse,
+    OrganizationDistanceResponse,
     RectangleSearchRequest,
-    OrganizationListParams, RadiusSearchRequest
+    OrganizationListParams, RadiusSearchRequest,
+    NearestSearchRequest,
+    ClusterRequest,
+    FullTextSearchRequest,
+    SuggestRequest,
+    OrganizationSuggestion,
+    OrganizationClusterResponse,
 )
 
 router = APIRouter(
     dependencies=[Depends(verify_api_key)]
 )
 
+# ETag по версиям таблиц - на каждый GET, кроме подсказок: они отвечают из памяти без запросов в БД.
+# В ответах - здания и деятельности из дерева, поэтому ETag зависит и от их версий
+conditional = Depends(ConditionalGet(
+    tables=(
+        Organization.__tablename__,
+        organization_activity.name,
+        Building.__tablename__,
+        Activity.__tablename__,
+    ),
+    cache_control=settings.cache_control_organizations,
+))
 
-@router.get("/organizations", response_model=List[OrganizationResponse])
+
+# Сериализаторы ответов собираются один раз при импорте
+ORGANIZATION = TypeAdapter(OrganizationResponse)
+ORGANIZATIONS = TypeAdapter(List[OrganizationResponse])
+ORGANIZATIONS_WITH_DISTANCE = TypeAdapter(List[OrganizationDistanceResponse])
+SUGGESTIONS = TypeAdapter(List[OrganizationSuggestion])
+CLUSTERS = TypeAdapter(List[OrganizationClusterResponse])
+
+
+@router.get("/organizations", response_model=List[OrganizationResponse], dependencies=[conditional])
 async def get_organizations(
     organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
     params: OrganizationListParams = Depends(),
 ):
     """
-    Получить список организаций по фильтрам
+    Получить список организаций по фильтрам.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
 
     :param params: OrganizationListParams фильтры для поиска организации
 
     :return: List[OrganizationResponse]
     """
 
-    return await organization_service.get_organizations(
+    page = await organization_service.get_organizations(
         filters=params.to_filter(),
         include_subactivities=params.include_subactivities,
         limit=params.limit,
-        offset=params.offset
+        offset=params.offset,
+        cursor=params.cursor,
+        name_match=params.name_match,
+        activity_depth=params.activity_depth,
     )
+    return page_response(ORGANIZATIONS, page)
+
+
+@router.get("/organizations/suggest", response_model=List[OrganizationSuggestion])
+async def suggest_organizations(
+        organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
+        params: SuggestRequest = Depends(),
+):
+    """
+    Подсказки при наборе названия: id и название организаций,
+    у которых название или слово в нём начинается с q. Отвечает из памяти процесса
+
+    :param params: SuggestRequest начало названия и количество подсказок
+
+    :return: List[OrganizationSuggestion]
+    """
+    suggestions = await organization_service.suggest_organizations(params)
+    return json_response(SUGGESTIONS, suggestions)
+
+
+@router.get("/organizations/search", response_model=List[OrganizationResponse], dependencies=[conditional])
+async def search_organizations(
+        organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
+        params: FullTextSearchRequest = Depends(),
+):
+    """
+    Полнотекстовый поиск по названию, видам деятельности и адресу одним запросом,
+    самые релевантные первыми.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
+
+    :param params: FullTextSearchRequest строка запроса и параметры страницы
+
+    :return: List[OrganizationResponse]
+    """
+    page = await organization_service.search_organizations(params)
+    return page_response(ORGANIZATIONS, page)
 
 
-@router.get("/organizations/within_radius", response_model=List[OrganizationResponse])
+@router.get("/organizations/within_radius", response_model=List[OrganizationDistanceResponse], dependencies=[conditional])
 async def get_organizations_within_radius(
         organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
         params: RadiusSearchRequest = Depends(),
 ):
     """
-    Поиск в указанном радиусе поиска
+    Поиск в указанном радиусе поиска.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
 
-    :param params: RadiusSearchRequest координаты поиска и радиус от них
+    :param params: RadiusSearchRequest координаты поиска, радиус от них и параметры страницы
 
-    :return:
+    :return: List[OrganizationDistanceResponse]
     """
-    return await organization_service.get_organizations_within_radius(params)
+    page = await organization_service.get_organizations_within_radius(params)
+    return page_response(ORGANIZATIONS_WITH_DISTANCE, page)
 
 
 
-@router.get("/organizations/within_rectangle", response_model=List[OrganizationResponse])
+@router.get("/organizations/within_rectangle", response_model=List[OrganizationDistanceResponse], dependencies=[conditional])
 async def get_organizations_within_rectangle(
         organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
         rectangle: RectangleSearchRequest = Depends(),
 ):
     """
-    Поиск организаций в указанной области
+    Поиск организаций в указанной области.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
 
     :param rectangle: RectangleSearchRequest
 
-    :return: List[OrganizationResponse]
+    :return: List[OrganizationDistanceResponse]
+    """
+
+    page = await organization_service.get_organizations_within_rectangle(rectangle)
+    return page_response(ORGANIZATIONS_WITH_DISTANCE, page)
+
+
+
+@router.get("/organizations/nearest", response_model=List[OrganizationDistanceResponse], dependencies=[conditional])
+async def get_nearest_organizations(
+        organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
+        params: NearestSearchRequest = Depends(),
+):
+    """
+    k ближайших к точке организаций с расстоянием, без подбора радиуса
+
+    :param params: NearestSearchRequest координаты точки и k
+
+    :return: List[OrganizationDistanceResponse]
+    """
+    organizations = await organization_service.get_nearest_organizations(params)
+    return json_response(ORGANIZATIONS_WITH_DISTANCE, organizations)
+
+
+
+@router.get("/organizations/clusters", response_model=List[OrganizationClusterResponse], dependencies=[conditional])
+async def get_organization_clusters(
+        organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
+        params: ClusterRequest = Depends(),
+):
     """
+    Кластеры организаций в области для отдалённого масштаба карты:
+    центроид ячейки сетки, число организаций и самые частые деятельности
 
-    return await organization_service.get_organizations_within_rectangle(rectangle)
+    :param params: ClusterRequest область и zoom либо размер сетки
 
+    :return: List[OrganizationClusterResponse]
+    """
+    clusters = await organization_service.get_organization_clusters(params)
+    return json_response(CLUSTERS, clusters)
 
 
-@router.get("/organizations/{organization_id}", response_model=OrganizationResponse)
+
+@router.get("/organizations/{organization_id}", response_model=OrganizationResponse, dependencies=[conditional])
 async def get_organization(
         organization_id: int,
         organization_service: Annotated[OrganizationService, Depends(get_organization_service)], # noqa
+        activity_depth: int = Query(0, ge=0, le=2, description="Вложенность деятельностей в ответе"),
 ):
     """
     Получить организацию по id
 
     :param organization_id:
+    :param activity_depth: 0 - деятельности без дочерних, 1 - с дочерними, 2 - ещё уровень ниже
 
     :return: OrganizationResponse
     """
-    return await organization_service.get_organization(organization_id)
+    organization = await organization_service.get_organization(organization_id, activity_depth)
+    return json_response(ORGANIZATION, organization)
+
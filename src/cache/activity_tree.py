@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from cache.versioned import VersionedCache
+from db.models import Activity
+from schemas.activity import ActivityResponse
+
+
+@dataclass(frozen=True, slots=True)
+class ActivityNode:
+    id: int
+    name: str
+    level: int
+    parent_id: int | None
+
+
+class ActivityTree(VersionedCache):
+    """
+    Дерево деятельностей в памяти процесса.
+    Таблица activities маленькая и почти не меняется, поэтому она целиком
+    держится в словарях
+    """
+    table_name = Activity.__tablename__
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self.nodes: dict[int, ActivityNode] = {}
+        self.ids: tuple[int, ...] = ()
+        self.parent: dict[int, int | None] = {}
+        self.children: dict[int, tuple[int, ...]] = {}
+        self.descendants: dict[int, tuple[int, ...]] = {}
+        self.ancestors: dict[int, tuple[int, ...]] = {}
+        self._rendered: dict[tuple[int, int], ActivityResponse] = {}
+
+    async def _reload(self, session: AsyncSession, version: int):
+        res = await session.execute(
+            select(Activity.id, Activity.name, Activity.level, Activity.parent_id)
+        )
+        self.build([ActivityNode(*row) for row in res.all()], version)
+
+    def build(self, nodes: list[ActivityNode], version: int):
+        nodes_by_id = {node.id: node for node in nodes}
+        parent = {node.id: node.parent_id for node in nodes}
+
+        children: dict[int, list[int]] = {node_id: [] for node_id in nodes_by_id}
+        for node in sorted(nodes, key=lambda n: n.id):
+            if node.parent_id in children:
+                children[node.parent_id].append(node.id)
+
+        ancestors: dict[int, tuple[int, ...]] = {}
+        for node_id in nodes_by_id:
+            chain = []
+            current = parent[node_id]
+            while current is not None and current in nodes_by_id and current not in chain:
+                chain.append(current)
+                current = parent[current]
+            ancestors[node_id] = tuple(chain)
+
+        descendants: dict[int, list[int]] = {node_id: [] for node_id in nodes_by_id}
+        for node_id, chain in ancestors.items():
+            for ancestor_id in chain:
+                descendants[ancestor_id].append(node_id)
+
+        # Подменяем все словари разом, чтобы читатели не видели смесь версий
+        self.nodes = nodes_by_id
+        self.ids = tuple(sorted(nodes_by_id))
+        self.parent = parent
+        self.children = {k: tuple(v) for k, v in children.items()}
+        self.ancestors = ancestors
+        self.descendants = {k: tuple(sorted(v)) for k, v in descendants.items()}
+        self._rendered = {}
+        self.version = version
+
+    def subtree_ids(self, root_ids: list[int]) -> list[int]:
+        """id корней и всех их потомков"""
+        result = []
+        for root_id in root_ids:
+            result.append(root_id)
+            result.extend(self.descendants.get(root_id, ()))
+        return list(dict.fromkeys(result))
+
+    def render(self, activity_id: int, depth: int) -> ActivityResponse:
+        """ActivityResponse с детьми до указанной глубины"""
+        key = (activity_id, depth)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            node = self.nodes[activity_id]
+            rendered = ActivityResponse(
+                id=node.id,
+                name=node.name,
+                level=node.level,
+                parent_id=node.parent_id,
+                children=[
+                    self.render(child_id, depth - 1)
+                    for child_id in self.children.get(activity_id, ())
+                ] if depth > 0 else None,
+            )
+            self._rendered[key] = rendered
+        return rendered
+
+
+activity_tree = ActivityTree(ttl=settings.activity_tree_ttl)
@@ -0,0 +1,106 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.versioned import VersionedCache
+from config import settings
+from db.models import Building
+from exceptions import GeoBackendUnavailableError
+from geo import EARTH_RADIUS_KM, bounding_boxes
+
+try:
+    import numpy as np
+except ImportError:  # numpy - необязательная зависимость (pip install .[numpy])
+    np = None
+
+
+class BuildingGeoIndex(VersionedCache):
+    """
+    Координаты всех зданий в непрерывных массивах NumPy, отсортированных по широте.
+    Поиск по радиусу и прямоугольнику: бинарный поиск диапазона широт,
+    затем векторные маски по долготе и haversine - без геоусловий в Postgres
+    """
+    table_name = Building.__tablename__
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self.ids = None
+        self.latitudes = None
+        self.longitudes = None
+        self._lat_rad = None
+        self._lon_rad = None
+        self._cos_lat = None
+
+    async def _reload(self, session: AsyncSession, version: int):
+        if np is None:
+            raise GeoBackendUnavailableError("numpy geo engine requires numpy to be installed")
+
+        res = await session.execute(select(Building.id, Building.latitude, Building.longitude))
+        rows = res.all()
+        self.build(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)),
+            version,
+        )
+
+    def build(self, ids, latitudes, longitudes, version: int):
+        order = np.argsort(latitudes, kind="stable")
+        ids, latitudes, longitudes = ids[order], latitudes[order], longitudes[order]
+        lat_rad = np.radians(latitudes)
+
+        # Подменяем все массивы разом, чтобы читатели не видели смесь версий
+        self.ids = ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self._lat_rad = lat_rad
+        self._lon_rad = np.radians(longitudes)
+        self._cos_lat = np.cos(lat_rad)
+        self.version = version
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float):
+        """(id зданий, расстояния в км) в пределах радиуса"""
+        candidates = np.concatenate([
+            self._box_positions(*box) for box in bounding_boxes(latitude, longitude, radius_km)
+        ])
+        distances = self._distances(candidates, latitude, longitude)
+        keep = distances <= radius_km
+        return self.ids[candidates[keep]], distances[keep]
+
+    def within_rectangle(
+            self,
+            min_lat: float,
+            max_lat: float,
+            min_lon: float,
+            max_lon: float,
+            center_lat: float,
+            center_lon: float,
+    ):
+        """(id зданий, расстояния в км до центра) внутри прямоугольника"""
+        positions = self._box_positions(min_lat, max_lat, min_lon, max_lon)
+        return self.ids[positions], self._distances(positions, center_lat, center_lon)
+
+    def nearest(self, latitude: float, longitude: float, count: int):
+        """(id зданий, расстояния в км) count ближайших зданий по возрастанию расстояния"""
+        distances = self._distances(slice(None), latitude, longitude)
+        if count < len(distances):
+            positions = np.argpartition(distances, count - 1)[:count]
+        else:
+            positions = np.arange(len(distances))
+        order = positions[np.argsort(distances[positions], kind="stable")]
+        return self.ids[order], distances[order]
+
+    def _box_positions(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+        start = np.searchsorted(self.latitudes, min_lat, side="left")
+        end = np.searchsorted(self.latitudes, max_lat, side="right")
+        longitudes = self.longitudes[start:end]
+        return start + np.flatnonzero((longitudes >= min_lon) & (longitudes <= max_lon))
+
+    def _distances(self, positions, latitude: float, longitude: float):
+        lat_rad = np.radians(latitude)
+        half_d_lat = np.sin((self._lat_rad[positions] - lat_rad) / 2)
+        half_d_lon = np.sin((self._lon_rad[positions] - np.radians(longitude)) / 2)
+        a = half_d_lat ** 2 + np.cos(lat_rad) * self._cos_lat[positions] * half_d_lon ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+building_geo_index = BuildingGeoIndex(ttl=settings.geo_index_ttl)
@@ -0,0 +1,153 @@
+"""
+Инвалидация кэшей между воркерами через LISTEN/NOTIFY Postgres.
+
+UnitOfWork в транзакции записи публикует теги изменённых таблиц и сущностей
+(pg_notify доставляется только после commit и только если он прошёл).
+Каждый воркер держит отдельное соединение с LISTEN и по тегам сбрасывает свои
+кэши в памяти: записи кэша запросов и in-process данные затронутых таблиц
+"""
+import asyncio
+import json
+import logging
+from typing import Iterable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.activity_tree import activity_tree
+from cache.building_geo_index import building_geo_index
+from cache.organization_names import organization_name_index
+from cache.query_cache import QueryCache, query_cache
+from cache.versioned import VersionedCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres ограничивает payload NOTIFY 8000 байтами
+MAX_PAYLOAD_BYTES = 7900
+
+
+def notification_payloads(tags: Iterable[str]) -> list[str]:
+    """JSON-списки тегов, каждый не длиннее MAX_PAYLOAD_BYTES"""
+    payloads, chunk, size = [], [], 2
+    for tag in sorted(tags):
+        tag_size = len(json.dumps(tag, ensure_ascii=False).encode()) + 1
+        if chunk and size + tag_size > MAX_PAYLOAD_BYTES:
+            payloads.append(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")))
+            chunk, size = [], 2
+        chunk.append(tag)
+        size += tag_size
+    if chunk:
+        payloads.append(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")))
+    return payloads
+
+
+async def publish_invalidation(session: AsyncSession, channel: str, tags: Iterable[str]):
+    """Уведомление в текущей транзакции: слушатели получат его после commit"""
+    for payload in notification_payloads(tags):
+        await session.execute(select(func.pg_notify(channel, payload)))
+
+
+class InvalidationListener:
+    """
+    Фоновая задача воркера: LISTEN channel и сброс кэшей по тегам из уведомлений.
+    При разрыве соединения переподключается и сбрасывает всё - уведомления за время
+    разрыва потеряны
+    """
+
+    def __init__(
+            self,
+            dsn: str,
+            channel: str,
+            query_cache: QueryCache,
+            caches: Iterable[VersionedCache],
+            reconnect_delay: float = 1.0,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.query_cache = query_cache
+        self.caches = tuple(caches)
+        self.reconnect_delay = reconnect_delay
+        self.listening = asyncio.Event()
+        self._pending: set[asyncio.Task] = set()
+        self._seen_versions: dict[str, int] = {}
+
+    async def run(self):
+        reconnecting = False
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.warning("cache invalidation listener: connection failed, retrying")
+                await asyncio.sleep(self.reconnect_delay)
+                reconnecting = True
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(self.channel, self._on_notification)
+                self.listening.set()
+                if reconnecting:
+                    await self.invalidate_all()
+                await closed.wait()
+            finally:
+                self.listening.clear()
+                await connection.close()
+            reconnecting = True
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            tags = json.loads(payload)
+        except ValueError:
+            tags = None
+        if isinstance(tags, list) and all(isinstance(tag, str) for tag in tags):
+            call = self.apply(tags)
+        else:
+            # Что изменилось, не разобрать: сбрасываем всё, как после разрыва соединения
+            logger.warning("cache invalidation listener: bad payload %r, invalidating all", payload)
+            call = self.invalidate_all()
+        task = asyncio.ensure_future(call)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def apply(self, tags: list[str]):
+        tags = set(tags)
+        for cache in self.caches:
+            if cache.table_name in tags:
+                cache.invalidate()
+        # Общий кэш (redis) сбрасывается и здесь: чтение этого воркера, начатое до commit,
+        # могло положить туда старый результат уже после сброса у воркера, делавшего запись
+        await self.query_cache.invalidate(tags)
+
+    async def catch_up(self, versions: dict[str, int]):
+        """
+        Сброс по версиям таблиц, прочитанным в запросе: таблицы, версия которых изменилась
+        с прошлого раза, сбрасываются так же, как по уведомлению. Ответ тогда не отстаёт
+        от этих версий, даже если уведомление ещё не пришло или кэш ждёт своего ttl
+        """
+        changed = {
+            table_name for table_name, version in versions.items()
+            if self._seen_versions.get(table_name) != version
+        }
+        if changed:
+            await self.apply(changed)
+            self._seen_versions.update((table_name, versions[table_name]) for table_name in changed)
+
+    async def invalidate_all(self):
+        for cache in self.caches:
+            cache.invalidate()
+        if self.query_cache.local:
+            await self.query_cache.clear()
+        else:
+            # Общий кэш целиком не чистим, но идущие загрузки этого воркера в него не попадут
+            self.query_cache.discard_in_flight()
+
+
+invalidation_listener = InvalidationListener(
+    settings.db.dsn,
+    settings.cache_invalidation_channel,
+    query_cache,
+    (activity_tree, building_geo_index, organization_name_index),
+)
@@ -0,0 +1,103 @@
+import re
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.versioned import VersionedCache
+from config import settings
+from db.models import Organization
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """Ключ для поиска по префиксу: регистр, ё/е, пунктуация и лишние пробелы не важны"""
+    return _SEPARATORS.sub(" ", name.casefold().replace("ё", "е")).strip()
+
+
+class OrganizationNameIndex(VersionedCache):
+    """
+    Префиксный индекс названий организаций для подсказок при наборе.
+    Отсортированный список пар (ключ, id), где ключ - нормализованное название
+    и каждый его хвост с начала слова («рога и копыта», «и копыта», «копыта»);
+    поиск - bisect по префиксу, без запросов в БД
+    """
+    table_name = Organization.__tablename__
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self.entries: list[tuple[str, int]] = []
+        self.names: dict[int, str] = {}
+
+    async def _reload(self, session: AsyncSession, version: int):
+        res = await session.execute(select(Organization.id, Organization.name))
+        self.build(res.all(), version)
+
+    def build(self, rows, version: int):
+        names = {organization_id: name for organization_id, name in rows}
+        entries = sorted(
+            (key, organization_id)
+            for organization_id, name in names.items()
+            for key in self._keys(name)
+        )
+
+        # Подменяем список и словарь разом, чтобы читатели не видели смесь версий
+        self.entries = entries
+        self.names = names
+        self.version = version
+
+    async def written_version(self, session: AsyncSession) -> int:
+        """
+        Версия таблицы после записи в текущей транзакции. Строку счётчика держит блокировка
+        нашего UPDATE из триггера, так что это версия ровно с нашей записью
+        """
+        return await self._fetch_version(session)
+
+    def put(self, organization_id: int, name: str, version: int | None = None):
+        """
+        Добавляет или переименовывает организацию после записи в этом процессе.
+        version - written_version этой записи: если индекс был на версию раньше, в нём
+        теперь всё до неё включительно, и ни проверка по ttl, ни своё же уведомление
+        не перечитают таблицу целиком
+        """
+        self.remove(organization_id)
+        for key in self._keys(name):
+            insort(self.entries, (key, organization_id))
+        self.names[organization_id] = name
+        # Один изменяющий statement - одно увеличение счётчика
+        if version is not None and self.version == version - 1:
+            self.version = version
+
+    def remove(self, organization_id: int):
+        name = self.names.pop(organization_id, None)
+        if name is None:
+            return
+        for key in self._keys(name):
+            position = bisect_left(self.entries, (key, organization_id))
+            if position < len(self.entries) and self.entries[position] == (key, organization_id):
+                del self.entries[position]
+
+    def suggest(self, query: str, limit: int) -> list[tuple[int, str]]:
+        """До limit организаций (id, название), у которых название или слово в нём начинается с query"""
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+
+        found: dict[int, str] = {}
+        position = bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(found) < limit:
+            key, organization_id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(organization_id, self.names[organization_id])
+            position += 1
+        return list(found.items())
+
+    @staticmethod
+    def _keys(name: str) -> set[str]:
+        words = normalize_name(name).split(" ")
+        return {" ".join(words[start:]) for start in range(len(words)) if words[start]}
+
+
+organization_name_index = OrganizationNameIndex(ttl=settings.name_index_ttl)
@@ -0,0 +1,294 @@
+"""
+Кэш результатов чтения репозиториев с инвалидацией по тегам.
+
+Ключ - метод репозитория и нормализованные аргументы (фильтры, страница, гео-параметры).
+Теги записи - область, от которой зависит выборка («organizations», «buildings:5») и сущности
+в результате («organizations:7»). Репозитории на add_one/change_one копят теги в session.info,
+UnitOfWork после commit сбрасывает все записи с этими тегами
+"""
+import functools
+import hashlib
+import inspect
+import json
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis - необязательная зависимость (pip install .[redis])
+    redis_asyncio = None
+
+SESSION_TAGS_KEY = "cache_tags"
+
+_MISSING = object()
+
+
+def _jsonable(value):
+    """Параметры запросов - pydantic-модели (фильтры, гео-параметры) или простые значения"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return str(value)
+
+
+def entity_tag(table_name: str, entity_id) -> str:
+    return f"{table_name}:{entity_id}"
+
+
+def track_write(session: AsyncSession, tags: Iterable[str]):
+    """Запоминает теги изменённых данных до commit транзакции"""
+    session.info.setdefault(SESSION_TAGS_KEY, set()).update(tags)
+
+
+class CacheBackend(ABC):
+    # Кэш в памяти процесса: записи других воркеров сбрасываются по уведомлениям из Postgres
+    local: bool = True
+
+    @abstractmethod
+    async def get(self, key: str):
+        """Значение или _MISSING"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value, tags: set[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def clear(self):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """LRU в памяти процесса: не больше maxsize записей, каждая живёт не дольше ttl секунд"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any, frozenset[str]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, tags: set[str]):
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(tags))
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            for key in self._keys_by_tag.pop(tag, ()):
+                self._drop(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self._keys_by_tag.clear()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class RedisBackend(CacheBackend):
+    """
+    Общий кэш для нескольких процессов в Redis-совместимом хранилище.
+    Значение - pickle по ключу с TTL, тег - множество ключей своих записей
+    """
+
+    local = False
+
+    def __init__(self, client, ttl: float, prefix: str = "query-cache:"):
+        self.client = client
+        self.ttl = max(int(ttl), 1)
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str | None, ttl: float) -> "RedisBackend":
+        if not url:
+            raise RuntimeError("redis query cache backend requires APP_REDIS_URL")
+        if redis_asyncio is None:
+            raise RuntimeError("redis query cache backend requires redis to be installed")
+        return cls(redis_asyncio.from_url(url), ttl)
+
+    async def get(self, key: str):
+        payload = await self.client.get(self.prefix + key)
+        return _MISSING if payload is None else pickle.loads(payload)
+
+    async def set(self, key: str, value, tags: set[str]):
+        key = self.prefix + key
+        await self.client.set(key, pickle.dumps(value), ex=self.ttl)
+        for tag in tags:
+            await self.client.sadd(self._tag_key(tag), key)
+            await self.client.expire(self._tag_key(tag), self.ttl)
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            keys = await self.client.smembers(tag_key)
+            await self.client.delete(tag_key, *keys)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+
+class QueryCache:
+    """
+    Кэш чтений; backend=None - кэш выключен, каждый вызов идёт в БД.
+
+    Чтение, начатое до commit записи и закончившееся после сброса её тегов, не должно
+    вернуть в кэш старые данные: invalidate помечает теги номером сброса, и результат
+    загрузки не сохраняется, если хоть один его тег сбросили после её начала
+    """
+    # Сколько помеченных тегов держать; при переполнении все идущие загрузки считаются устаревшими
+    max_invalidated_tags = 10_000
+
+    def __init__(self, backend: CacheBackend | None):
+        self.backend = backend
+        self._clock = 0
+        self._floor = 0
+        self._invalidated_at: dict[str, int] = {}
+        self._loading = 0
+
+    async def get_or_load(
+            self,
+            namespace: str,
+            params: dict,
+            tags: set[str],
+            load: Callable[[], Awaitable[Any]],
+            result_tags: Callable[[Any], Iterable[str]] = lambda result: (),
+    ):
+        if self.backend is None:
+            return await load()
+
+        key = self.make_key(namespace, params)
+        value = await self.backend.get(key)
+        if value is not _MISSING:
+            return value
+
+        started = self._clock
+        self._loading += 1
+        try:
+            value = await load()
+        finally:
+            self._loading -= 1
+
+        all_tags = set(tags) | set(result_tags(value))
+        if not self._invalidated_since(started, all_tags):
+            await self.backend.set(key, value, all_tags)
+        if not self._loading:
+            # Загрузок, начатых до этих сбросов, больше нет
+            self._invalidated_at.clear()
+        return value
+
+    @property
+    def local(self) -> bool:
+        return self.backend is not None and self.backend.local
+
+    async def invalidate(self, tags: Iterable[str]):
+        tags = set(tags)
+        if self.backend is None or not tags:
+            return
+        self._clock += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self._clock
+        if len(self._invalidated_at) > self.max_invalidated_tags:
+            self.discard_in_flight()
+        await self.backend.invalidate(tags)
+
+    async def clear(self):
+        self.discard_in_flight()
+        if self.backend is not None:
+            await self.backend.clear()
+
+    def discard_in_flight(self):
+        """Результаты загрузок, начатых до этого момента, в кэш не попадут"""
+        self._clock += 1
+        self._floor = self._clock
+        self._invalidated_at.clear()
+
+    def _invalidated_since(self, started: int, tags: set[str]) -> bool:
+        return started < self._floor or any(
+            self._invalidated_at.get(tag, 0) > started for tag in tags
+        )
+
+    @staticmethod
+    def make_key(namespace: str, params: dict) -> str:
+        normalized = json.dumps(params, sort_keys=True, default=_jsonable, ensure_ascii=False)
+        return f"{namespace}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def cached_query(tags: str, variant: str | None = None):
+    """
+    Кэширует чтение репозитория. tags - имя метода репозитория, который по аргументам
+    чтения возвращает теги области выборки; теги сущностей результата даёт self._result_tags(result).
+    variant - имя метода, который возвращает настройки, от которых зависит результат помимо
+    аргументов (бэкенд запроса): они входят в ключ
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, session: AsyncSession, *args, **kwargs):
+            bound = signature.bind(self, session, *args, **kwargs)
+            bound.apply_defaults()
+            params = {name: value for name, value in bound.arguments.items() if name not in ("self", "session")}
+            key_params = params if variant is None else {**params, "variant": getattr(self, variant)()}
+            return await self.cache.get_or_load(
+                f"{self.model.__tablename__}.{method.__name__}",
+                key_params,
+                set(getattr(self, tags)(**params)),
+                lambda: method(self, session, *args, **kwargs),
+                self._result_tags,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def create_query_cache() -> QueryCache:
+    if settings.query_cache_backend == "redis":
+        return QueryCache(RedisBackend.from_url(settings.redis_url, settings.query_cache_ttl))
+    if settings.query_cache_backend == "memory":
+        return QueryCache(MemoryBackend(settings.query_cache_size, settings.query_cache_ttl))
+    return QueryCache(None)
+
+
+query_cache = create_query_cache()
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import table_versions
+
+
+class VersionedCache:
+    """
+    Базовый класс для данных, которые целиком держатся в памяти процесса.
+    Актуальность проверяется по счётчику в table_versions не чаще, чем раз в ttl секунд;
+    если версия изменилась, наследник перечитывает данные в _reload
+    """
+    table_name: str = None
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version: int | None = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def invalidate(self):
+        """
+        Помечает данные устаревшими: при следующем обращении версия проверится сразу,
+        не дожидаясь ttl, и данные перечитаются, если она изменилась
+        """
+        self._stale = True
+
+    async def ensure_fresh(self, session: AsyncSession):
+        """Проверяет версию таблицы и при необходимости перечитывает данные"""
+        if not self._needs_check():
+            return self
+
+        async with self._lock:
+            if not self._needs_check():
+                return self
+
+            # Версию читаем до строк: если запись случится между запросами,
+            # следующая проверка увидит новую версию и перечитает данные
+            version = await self._fetch_version(session)
+            if version != self.version:
+                await self._reload(session, version)
+
+            self._checked_at = time.monotonic()
+            self._stale = False
+
+        return self
+
+    async def load(self, session: AsyncSession):
+        """Принудительная загрузка (при старте приложения)"""
+        self.version = None
+        self.invalidate()
+        return await self.ensure_fresh(session)
+
+    async def _reload(self, session: AsyncSession, version: int):
+        raise NotImplementedError
+
+    def _needs_check(self) -> bool:
+        return self._stale or time.monotonic() - self._checked_at >= self.ttl
+
+    async def _fetch_version(self, session: AsyncSession) -> int:
+        res = await session.execute(
+            select(table_versions.c.version)
+            .where(table_versions.c.table_name == self.table_name)
+        )
+        return res.scalar_one_or_none() or 0
@@ -0,0 +1,87 @@
+"""
+Условные GET-запросы: слабый ETag из версий таблиц (table_versions, счётчики обновляют триггеры)
+и адреса запроса. Совпавший If-None-Match отвечается 304 ещё в зависимости роутера -
+до основного запроса и сериализации. Cache-Control задаётся на роутер.
+Кэши, отставшие от прочитанных версий, сбрасываются до ответа (InvalidationListener.catch_up):
+иначе под новым ETag ушло бы старое тело и клиент получал бы на него 304
+"""
+import hashlib
+import json
+
+from fastapi import Depends, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.invalidation import InvalidationListener, invalidation_listener
+from db.database import get_db_session
+from db.models import table_versions
+from exceptions import NotModifiedException
+
+# Ответ зависит от API-ключа: если Cache-Control настроят на public, общий кэш не отдаст его без ключа
+CONDITIONAL_VARY = "Authorization"
+
+
+def make_etag(request: Request, versions: dict[str, int]) -> str:
+    """
+    Порядок параметров в query string на ETag не влияет. ETag слабый: запись, закоммиченная
+    между чтением версий и основным запросом, попадёт в тело под прежним ETag
+    """
+    payload = json.dumps(
+        [request.url.path, sorted(request.query_params.multi_items()), sorted(versions.items())],
+        separators=(",", ":"),
+    )
+    return 'W/"' + hashlib.sha1(payload.encode()).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Сравнение для If-None-Match - слабое: префикс W/ не учитывается"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+class ConditionalGet:
+    """
+    Зависимость роутера: ответ зависит только от таблиц tables.
+    ETag и Cache-Control кладутся в request.state, в ответ их добавляет conditional_headers
+    """
+
+    def __init__(
+            self,
+            tables: tuple[str, ...],
+            cache_control: str,
+            listener: InvalidationListener = invalidation_listener,
+    ):
+        self.tables = tables
+        self.cache_control = cache_control
+        self.listener = listener
+
+    async def __call__(self, request: Request, session: AsyncSession = Depends(get_db_session)):
+        if request.method not in ("GET", "HEAD"):
+            return
+
+        res = await session.execute(
+            select(table_versions.c.table_name, table_versions.c.version)
+            .where(table_versions.c.table_name.in_(self.tables))
+        )
+        versions = dict(res.all())
+        etag = make_etag(request, versions)
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise NotModifiedException(etag, self.cache_control)
+
+        await self.listener.catch_up(versions)
+        request.state.etag = etag
+        request.state.cache_control = self.cache_control
+
+
+async def conditional_headers(request: Request, call_next):
+    """Middleware: ETag и Cache-Control от ConditionalGet к успешным ответам"""
+    response = await call_next(request)
+    etag = getattr(request.state, "etag", None)
+    if etag is not None and response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = request.state.cache_control
+        response.headers["Vary"] = CONDITIONAL_VARY
+    return response
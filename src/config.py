@@ -1,3 +1,5 @@
+from typing import Literal
+
 from aiohttp import ClientSession
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -32,11 +34,45 @@ class DbSettings(BaseSettings):
     def dsn_asyncpg(self):
         return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
 
+    @property
+    def dsn(self):
+        """Для прямого соединения asyncpg (LISTEN)"""
+        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
+
 class Settings(BaseSettings):
     port: int
     host: str
     api_key: str
 
+    # Как часто (в секундах) проверять версию дерева деятельностей в БД
+    activity_tree_ttl: float = 5.0
+
+    # Бэкенд геозапросов: auto - определяется при старте (postgis, если есть buildings.location)
+    geo_backend: Literal["auto", "postgis", "sql"] = "auto"
+
+    # Движок радиуса/прямоугольника: sql - условия в БД, numpy - координаты зданий в памяти процесса
+    geo_engine: Literal["sql", "numpy"] = "sql"
+    geo_index_ttl: float = 5.0
+
+    # Как часто проверять версию organizations для префиксного индекса подсказок
+    name_index_ttl: float = 5.0
+
+    # Кэш чтений репозиториев: memory - LRU в процессе, redis - общий (нужен redis_url), off - выключен
+    query_cache_backend: Literal["memory", "redis", "off"] = "memory"
+    query_cache_ttl: float = 30.0
+    query_cache_size: int = 10_000
+    redis_url: str | None = None
+
+    # Cache-Control ответов GET по роутерам: ETag позволяет клиентам дешево перепроверять данные.
+    # Ответы требуют API-ключ, поэтому по умолчанию private - общие кэши (CDN, прокси) их не хранят
+    cache_control_activities: str = "private, max-age=300"
+    cache_control_buildings: str = "private, max-age=60"
+    cache_control_organizations: str = "private, max-age=0, must-revalidate"
+
+    # Канал Postgres, через который воркеры сообщают друг другу об изменениях после commit
+    cache_invalidation_channel: str = "cache_invalidation"
+    cache_invalidation_listen: bool = True
+
     db: DbSettings
 
     model_config = SettingsConfigDict(
@@ -1,19 +1,25 @@
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
 
 from config import settings
+from exceptions import GeoBackendUnavailableError
+from request_timing import instrument_engine
 from typing import AsyncGenerator
 
 Base = declarative_base()
 
 
 def create_session_maker(db_url: str) -> async_sessionmaker[AsyncSession]:
+    engine = create_async_engine(
+        url=db_url,
+        pool_size=5,
+        max_overflow=10
+    )
+    # Число запросов и время в БД на каждый HTTP-запрос (заголовок Server-Timing)
+    instrument_engine(engine.sync_engine)
     return async_sessionmaker(
-        bind=create_async_engine(
-            url=db_url,
-            pool_size=5,
-            max_overflow=10
-        ),
+        bind=engine,
         expire_on_commit=False,
         class_=AsyncSession
     )
@@ -28,3 +34,21 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+
+
+async def resolve_geo_backend(session: AsyncSession, configured: str) -> str:
+    """
+    Определяет бэкенд геозапросов: postgis, если миграция создала
+    колонку buildings.location (значит расширение установлено), иначе sql
+    """
+    res = await session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'buildings' AND column_name = 'location')"
+    ))
+    postgis_available = res.scalar_one()
+
+    if configured == "auto":
+        return "postgis" if postgis_available else "sql"
+    if configured == "postgis" and not postgis_available:
+        raise GeoBackendUnavailableError("PostGIS backend requested but buildings.location is missing")
+    return configured
@@ -1,25 +1,50 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, ARRAY
-from sqlalchemy.orm import relationship, declarative_base, validates
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, ForeignKey, Table, ARRAY, Index, Computed
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY, TSVECTOR
+from sqlalchemy.orm import relationship, declarative_base, validates, deferred
+from sqlalchemy.orm.util import identity_key
 from exceptions import ActivityValidationError
 from db.database import Base
+from geo import GEOHASH_PRECISION
 
 # Таблица для связи многие-ко-многим между Организациями и Деятельностями
 organization_activity = Table(
     'organization_activity',
     Base.metadata,
-    Column('organization_id', Integer, ForeignKey('organizations.id')),
-    Column('activity_id', Integer, ForeignKey('activities.id'))
+    Column('organization_id', Integer, ForeignKey('organizations.id'), primary_key=True),
+    Column('activity_id', Integer, ForeignKey('activities.id'), primary_key=True),
+    # Обратный индекс под фильтр по деятельности: PK покрывает только поиск по организации
+    Index('ix_organization_activity_activity_id', 'activity_id', 'organization_id'),
+)
+
+# Версии таблиц: увеличиваются триггером на каждое изменение,
+# по ним in-process кэши понимают, что данные устарели
+table_versions = Table(
+    'table_versions',
+    Base.metadata,
+    Column('table_name', String(100), primary_key=True),
+    Column('version', BigInteger, nullable=False, server_default='0'),
 )
 
 
 class Building(Base):
     """Модель Здания"""
     __tablename__ = 'buildings'
+    __table_args__ = (
+        # Под bbox-префильтр поиска по радиусу и прямоугольнику
+        Index('ix_buildings_latitude_longitude', 'latitude', 'longitude'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     address = Column(String(500), nullable=False, unique=True)
     latitude = Column(Float, nullable=False)  # Широта
     longitude = Column(Float, nullable=False)  # Долгота
+    # Geohash координат, считается в БД при вставке/обновлении (см. geo.geohash_encode)
+    geohash = Column(
+        String(12, collation='C'),
+        Computed(f'geohash_encode(latitude, longitude, {GEOHASH_PRECISION})', persisted=True),
+        nullable=False,
+        index=True,
+    )
 
     # Связь с организациями
     organizations = relationship("Organization", back_populates="building", cascade="all, delete-orphan")
@@ -35,7 +60,7 @@ class Activity(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     level = Column(Integer, default=1)  # Уровень вложенности
-    parent_id = Column(Integer, ForeignKey('activities.id'), nullable=True)
+    parent_id = Column(Integer, ForeignKey('activities.id'), nullable=True, index=True)
 
     @validates('level')
     def validate_level(self, key, level):
@@ -48,15 +73,27 @@ class Activity(Base):
     def validate_parent(self, key, parent_id):
         """Валидация родителя для контроля вложенности"""
         if parent_id:
-            # Проверяем, что родитель не имеет уровень 3
-            from sqlalchemy.orm import Session
-            session = Session.object_session(self)
-            if session:
-                parent = session.query(Activity).get(parent_id)
-                if parent and parent.level >= 3:
-                    raise ActivityValidationError("Нельзя создать дочернюю активность для уровня 3")
+            # Проверяем, что родитель не имеет уровень 3.
+            # Запросов не делаем: уровень берём из сессии или из дерева в памяти,
+            # окончательную проверку делает триггер activity_closure в БД
+            parent_level = self._parent_level(parent_id)
+            if parent_level is not None and parent_level >= 3:
+                raise ActivityValidationError("Нельзя создать дочернюю активность для уровня 3")
         return parent_id
 
+    def _parent_level(self, parent_id: int) -> int | None:
+        from sqlalchemy.orm import Session
+        from cache.activity_tree import activity_tree
+
+        session = Session.object_session(self)
+        if session:
+            parent = session.identity_map.get(identity_key(Activity, parent_id))
+            if parent is not None:
+                return parent.level
+
+        node = activity_tree.nodes.get(parent_id)
+        return node.level if node else None
+
     # Рекурсивная связь для древовидной структуры
     parent = relationship(
         "Activity",
@@ -82,14 +119,43 @@ class Activity(Base):
         return f"<Activity {self.name} (Level: {self.level})>"
 
 
+# Closure-таблица иерархии деятельностей: все пары (предок, потомок) с расстоянием.
+# Поддерживается триггерами в БД при вставке и переносе, удаление - через CASCADE
+activity_closure = Table(
+    'activity_closure',
+    Base.metadata,
+    Column('ancestor_id', Integer, ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True),
+    Column('descendant_id', Integer, ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True),
+    Column('depth', Integer, nullable=False),
+    Index('ix_activity_closure_descendant_id', 'descendant_id', 'ancestor_id'),
+)
+
+
 class Organization(Base):
     """Модель Организации"""
     __tablename__ = 'organizations'
+    __table_args__ = (
+        # Триграммы названия (pg_trgm): ilike по подстроке и поиск по похожести без полного чтения таблицы
+        Index(
+            'ix_organizations_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+        Index('ix_organizations_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_organizations_phone_suffixes', 'phone_suffixes', postgresql_using='gin'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(300), nullable=False)
-    building_id = Column(Integer, ForeignKey('buildings.id'), nullable=False)
+    building_id = Column(Integer, ForeignKey('buildings.id'), nullable=False, index=True)
     phone_numbers = Column(ARRAY(String), nullable=False, default=[])  # Массив телефонов
+    # Телефоны только цифрами и все их хвосты от 4 цифр - считаются в БД при записи,
+    # по phone_suffixes ищется номер целиком или по окончанию
+    phone_digits = deferred(Column(PG_ARRAY(Text), Computed('phone_digits(phone_numbers)', persisted=True)))
+    phone_suffixes = deferred(Column(PG_ARRAY(Text), Computed('phone_suffixes(phone_numbers)', persisted=True)))
+    # Полнотекстовый вектор (russian): название, деятельности и адрес здания.
+    # Пересчитывается триггерами в БД, в обычные выборки не попадает
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
 
     # Связи
     building = relationship(
@@ -1,6 +1,13 @@
-from fastapi import Request, status
+from fastapi import Request, Response, status
 from fastapi.responses import JSONResponse
-from exceptions import ModelAlreadyExistsException, OrganizationNoFoundException, ModelNoFoundException
+from conditional import CONDITIONAL_VARY
+from exceptions import (
+    ModelAlreadyExistsException,
+    OrganizationNoFoundException,
+    ModelNoFoundException,
+    InvalidCursorException,
+    NotModifiedException,
+)
 
 async def model_not_found_handler(
     request: Request,
@@ -38,3 +45,30 @@ async def organization_not_found_handler(
             "message": exc.detail,
         },
     )
+
+
+async def invalid_cursor_handler(
+    request: Request,
+    exc: InvalidCursorException,
+):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={
+            "error": "invalid_cursor",
+            "message": exc.detail,
+        },
+    )
+
+
+async def not_modified_handler(
+    request: Request,
+    exc: NotModifiedException,
+):
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={
+            "ETag": exc.etag,
+            "Cache-Control": exc.cache_control,
+            "Vary": CONDITIONAL_VARY,
+        },
+    )
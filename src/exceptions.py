@@ -17,6 +17,24 @@ class ActivityValidationError(Exception):
     """Исключение для валидации активности"""
 
 
+class InvalidCursorException(Exception):
+    """Невалидный курсор пагинации"""
+
+    detail = "Invalid pagination cursor"
+
+
+class NotModifiedException(Exception):
+    """Данные не менялись с версии, которая уже есть у клиента (If-None-Match)"""
+
+    def __init__(self, etag: str, cache_control: str):
+        self.etag = etag
+        self.cache_control = cache_control
+
+
+class GeoBackendUnavailableError(Exception):
+    """Запрошенный бэкенд геозапросов недоступен в БД"""
+
+
 class OrganizationNoFoundException(ModelNoFoundException):
     """Организация не найдена"""
 
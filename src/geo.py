@@ -0,0 +1,148 @@
+"""
+Геометрия на сфере для поиска по координатам
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Половина большого круга - дальше двух точек на сфере не бывает
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+# (min_lat, max_lat, min_lon, max_lon)
+BoundingBox = tuple[float, float, float, float]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по большому кругу, устойчивое к ошибкам округления"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bounding_boxes(latitude: float, longitude: float, radius_km: float) -> list[BoundingBox]:
+    """
+    Прямоугольники по широте/долготе, целиком покрывающие круг.
+    Обычно один, при пересечении 180-го меридиана - два
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = latitude - math.degrees(angular)
+    max_lat = latitude + math.degrees(angular)
+
+    # Круг накрывает полюс - по долготе ограничений нет
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+
+    ratio = math.sin(angular) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    d_lon = math.degrees(math.asin(ratio))
+    min_lon = longitude - d_lon
+    max_lon = longitude + d_lon
+
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+# ---------- GEOHASH ----------
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 12
+# Верхняя граница для префикса в C-collation: больше любого символа алфавита
+GEOHASH_RANGE_END = "~"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash точки; та же реализация, что у функции geohash_encode в БД"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    value = 0
+    for bit in range(precision * 5):
+        current, coordinate = (lon_range, longitude) if bit % 2 == 0 else (lat_range, latitude)
+        mid = (current[0] + current[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            current[0] = mid
+        else:
+            value = value * 2
+            current[1] = mid
+    return _geohash_from_int(value, precision)
+
+
+def geohash_ranges(boxes: list[BoundingBox], max_cells: int = 32) -> list[tuple[str, str]]:
+    """
+    Покрывает прямоугольники ячейками geohash и склеивает соседние ячейки
+    в диапазоны [start, end) для чтения B-tree индекса по колонке geohash.
+    Точность подбирается самой мелкой, при которой ячеек не больше max_cells
+    """
+    for precision in range(8, 0, -1):
+        spans = [_cell_span(box, precision) for box in boxes]
+        total = sum(len(lon_idx) * len(lat_idx) for lon_idx, lat_idx in spans)
+        if total <= max_cells or precision == 1:
+            break
+
+    values = sorted({
+        _interleave(lon, lat, precision)
+        for lon_indexes, lat_indexes in spans
+        for lon in lon_indexes
+        for lat in lat_indexes
+    })
+
+    ranges = []
+    start = prev = values[0]
+    for value in values[1:]:
+        if value != prev + 1:
+            ranges.append((start, prev))
+            start = value
+        prev = value
+    ranges.append((start, prev))
+
+    return [
+        (_geohash_from_int(first, precision), _geohash_from_int(last, precision) + GEOHASH_RANGE_END)
+        for first, last in ranges
+    ]
+
+
+def _cell_span(box: BoundingBox, precision: int) -> tuple[range, range]:
+    min_lat, max_lat, min_lon, max_lon = box
+    lon_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return (
+        _index_range(min_lon + 180, max_lon + 180, 360 / 2 ** lon_bits, 2 ** lon_bits),
+        _index_range(min_lat + 90, max_lat + 90, 180 / 2 ** lat_bits, 2 ** lat_bits),
+    )
+
+
+def _index_range(low: float, high: float, cell: float, count: int) -> range:
+    first = min(max(int(low // cell), 0), count - 1)
+    last = min(max(int(high // cell), 0), count - 1)
+    return range(first, last + 1)
+
+
+def _interleave(lon_index: int, lat_index: int, precision: int) -> int:
+    """Биты geohash: долгота и широта поочерёдно, начиная с долготы"""
+    lon_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    value = 0
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            value = value * 2 + ((lon_index >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            value = value * 2 + ((lat_index >> lat_bits) & 1)
+    return value
+
+
+def _geohash_from_int(value: int, precision: int) -> str:
+    chars = []
+    for _ in range(precision):
+        chars.append(GEOHASH_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
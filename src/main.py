@@ -1,15 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Depends
 from api.v1.endpoints import organizations, activities, buildings
+from cache.activity_tree import activity_tree
+from cache.building_geo_index import building_geo_index
+from cache.invalidation import invalidation_listener
+from cache.organization_names import organization_name_index
+from conditional import conditional_headers
 from config import settings
+from db.database import async_session_maker, resolve_geo_backend
+from request_timing import server_timing
 import uvicorn
 from exception_handlers import (
     model_not_found_handler,
     model_already_exists_handler,
     organization_not_found_handler,
+    invalid_cursor_handler,
+    not_modified_handler,
+)
+from exceptions import (
+    ModelNoFoundException,
+    ModelAlreadyExistsException,
+    OrganizationNoFoundException,
+    InvalidCursorException,
+    NotModifiedException,
 )
-from exceptions import ModelNoFoundException, ModelAlreadyExistsException, OrganizationNoFoundException
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Слушаем уведомления до загрузки кэшей, чтобы не пропустить записи между ними
+    listener = None
+    if settings.cache_invalidation_listen:
+        listener = asyncio.create_task(invalidation_listener.run())
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(invalidation_listener.listening.wait(), timeout=5)
+
+    async with async_session_maker() as session:
+        settings.geo_backend = await resolve_geo_backend(session, settings.geo_backend)
+        # Справочник деятельностей загружаем в память один раз при старте
+        await activity_tree.load(session)
+        await organization_name_index.load(session)
+        if settings.geo_engine == "numpy":
+            await building_geo_index.load(session)
+    yield
+
+    if listener is not None:
+        listener.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_exception_handler(
     ModelNoFoundException,
@@ -26,6 +67,20 @@ app.add_exception_handler(
     organization_not_found_handler,
 )
 
+app.add_exception_handler(
+    InvalidCursorException,
+    invalid_cursor_handler,
+)
+
+app.add_exception_handler(
+    NotModifiedException,
+    not_modified_handler,
+)
+
+app.middleware("http")(conditional_headers)
+# Последним - внешним: total включает остальные middleware
+app.middleware("http")(server_timing)
+
 app.include_router(activities.router, prefix="/api/v1", tags=["activities"])
 app.include_router(buildings.router, prefix="/api/v1", tags=["buildings"])
 app.include_router(organizations.router, prefix="/api/v1", tags=["organizations"])
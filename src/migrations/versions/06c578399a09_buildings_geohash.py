@@ -0,0 +1,76 @@
+"""buildings geohash
+
+Revision ID: 06c578399a09
+Revises: 7c1771112d13
+Create Date: 2026-10-18 15:54:48.617802
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '06c578399a09'
+down_revision: Union[str, Sequence[str], None] = '7c1771112d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Та же бисекция, что geo.geohash_encode в приложении
+    op.execute("""
+        CREATE FUNCTION geohash_encode(lat double precision, lon double precision, precision integer)
+        RETURNS text AS $$
+        DECLARE
+            alphabet constant text := '0123456789bcdefghjkmnpqrstuvwxyz';
+            lat_min double precision := -90;
+            lat_max double precision := 90;
+            lon_min double precision := -180;
+            lon_max double precision := 180;
+            mid double precision;
+            result text := '';
+            bit integer := 0;
+            ch integer := 0;
+        BEGIN
+            WHILE length(result) < precision LOOP
+                IF bit % 2 = 0 THEN
+                    mid := (lon_min + lon_max) / 2;
+                    IF lon >= mid THEN ch := ch * 2 + 1; lon_min := mid;
+                    ELSE ch := ch * 2; lon_max := mid;
+                    END IF;
+                ELSE
+                    mid := (lat_min + lat_max) / 2;
+                    IF lat >= mid THEN ch := ch * 2 + 1; lat_min := mid;
+                    ELSE ch := ch * 2; lat_max := mid;
+                    END IF;
+                END IF;
+                bit := bit + 1;
+                IF bit % 5 = 0 THEN
+                    result := result || substr(alphabet, ch + 1, 1);
+                    ch := 0;
+                END IF;
+            END LOOP;
+            RETURN result;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE
+    """)
+
+    # Генерируемая колонка: заполняется при вставке/обновлении координат,
+    # существующие строки заполняются при добавлении колонки
+    op.add_column('buildings', sa.Column(
+        'geohash',
+        sa.String(length=12, collation='C'),
+        sa.Computed('geohash_encode(latitude, longitude, 12)', persisted=True),
+        nullable=False,
+    ))
+    op.create_index('ix_buildings_geohash', 'buildings', ['geohash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_buildings_geohash', table_name='buildings')
+    op.drop_column('buildings', 'geohash')
+    op.execute("DROP FUNCTION geohash_encode(double precision, double precision, integer)")
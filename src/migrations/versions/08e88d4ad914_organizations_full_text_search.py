@@ -0,0 +1,135 @@
+"""organizations full text search
+
+Revision ID: 08e88d4ad914
+Revises: acf823801c38
+Create Date: 2026-10-18 16:08:16.698020
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '08e88d4ad914'
+down_revision: Union[str, Sequence[str], None] = 'acf823801c38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Пересчёт вектора для организаций, затронутых изменением в связанной таблице
+REFRESH = "UPDATE organizations SET search_vector = organization_search_vector(name, building_id, id) WHERE {}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('organizations', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Название важнее деятельностей, деятельности важнее адреса - веса A, B, C для ранжирования
+    op.execute("""
+        CREATE FUNCTION organization_search_vector(org_name text, org_building_id integer, org_id integer)
+        RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('russian', coalesce(org_name, '')), 'A')
+                || setweight(to_tsvector('russian', coalesce((
+                       SELECT string_agg(activities.name, ' ')
+                       FROM organization_activity
+                       JOIN activities ON activities.id = organization_activity.activity_id
+                       WHERE organization_activity.organization_id = org_id
+                   ), '')), 'B')
+                || setweight(to_tsvector('russian', coalesce((
+                       SELECT address FROM buildings WHERE id = org_building_id
+                   ), '')), 'C')
+        $$ LANGUAGE sql STABLE
+    """)
+
+    op.execute("""
+        CREATE FUNCTION organizations_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := organization_search_vector(NEW.name, NEW.building_id, NEW.id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER organizations_search_vector
+        BEFORE INSERT OR UPDATE OF name, building_id ON organizations
+        FOR EACH ROW EXECUTE FUNCTION organizations_search_vector()
+    """)
+
+    op.execute(f"""
+        CREATE FUNCTION organization_activity_search_vector() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                {REFRESH.format("id = NEW.organization_id")};
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                {REFRESH.format("id = OLD.organization_id")};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER organization_activity_search_vector
+        AFTER INSERT OR UPDATE OR DELETE ON organization_activity
+        FOR EACH ROW EXECUTE FUNCTION organization_activity_search_vector()
+    """)
+
+    op.execute(f"""
+        CREATE FUNCTION activities_search_vector() RETURNS trigger AS $$
+        BEGIN
+            {REFRESH.format("id IN (SELECT organization_id FROM organization_activity WHERE activity_id = NEW.id)")};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER activities_search_vector
+        AFTER UPDATE OF name ON activities
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION activities_search_vector()
+    """)
+
+    op.execute(f"""
+        CREATE FUNCTION buildings_search_vector() RETURNS trigger AS $$
+        BEGIN
+            {REFRESH.format("building_id = NEW.id")};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER buildings_search_vector
+        AFTER UPDATE OF address ON buildings
+        FOR EACH ROW WHEN (OLD.address IS DISTINCT FROM NEW.address)
+        EXECUTE FUNCTION buildings_search_vector()
+    """)
+
+    # Заполнение существующих строк: триггер на name/building_id при этом не срабатывает
+    op.execute(REFRESH.format("true"))
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_search_vector")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_organizations_search_vector "
+            "ON organizations USING gin (search_vector)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_search_vector")
+
+    op.execute("DROP TRIGGER buildings_search_vector ON buildings")
+    op.execute("DROP FUNCTION buildings_search_vector()")
+    op.execute("DROP TRIGGER activities_search_vector ON activities")
+    op.execute("DROP FUNCTION activities_search_vector()")
+    op.execute("DROP TRIGGER organization_activity_search_vector ON organization_activity")
+    op.execute("DROP FUNCTION organization_activity_search_vector()")
+    op.execute("DROP TRIGGER organizations_search_vector ON organizations")
+    op.execute("DROP FUNCTION organizations_search_vector()")
+    op.execute("DROP FUNCTION organization_search_vector(text, integer, integer)")
+    op.drop_column('organizations', 'search_vector')
@@ -0,0 +1,58 @@
+"""table versions
+
+Revision ID: 1e3ac442b1d6
+Revises: 5454e79b659c
+Create Date: 2026-10-18 15:51:17.402313
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e3ac442b1d6'
+down_revision: Union[str, Sequence[str], None] = '5454e79b659c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('activities', 'buildings', 'organizations', 'organization_activity')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(
+        sa.table('table_versions', sa.column('table_name', sa.String)),
+        [{'table_name': name} for name in VERSIONED_TABLES],
+    )
+
+    # Счётчик версии увеличивается один раз на каждый изменяющий statement
+    op.execute("""
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for name in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {name}_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {name}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in VERSIONED_TABLES:
+        op.execute(f"DROP TRIGGER {name}_bump_version ON {name}")
+    op.execute("DROP FUNCTION bump_table_version()")
+    op.drop_table('table_versions')
@@ -0,0 +1,71 @@
+"""organizations phone digits
+
+Revision ID: 503c7e2d32a4
+Revises: 08e88d4ad914
+Create Date: 2026-10-18 16:10:30.179133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '503c7e2d32a4'
+down_revision: Union[str, Sequence[str], None] = '08e88d4ad914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Номер без форматирования: «8-923-666-13-13» -> «89236661313»
+    op.execute("""
+        CREATE FUNCTION phone_digits(phones character varying[]) RETURNS text[] AS $$
+            SELECT coalesce(array_agg(regexp_replace(phone, '\\D', '', 'g')), '{}')
+            FROM unnest(phones) AS phone
+        $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    """)
+    # Все хвосты номеров от 4 цифр: поиск по окончанию номера - то же вхождение в массив (@>)
+    op.execute("""
+        CREATE FUNCTION phone_suffixes(phones character varying[]) RETURNS text[] AS $$
+            SELECT coalesce(array_agg(DISTINCT right(digits, size)), '{}')
+            FROM unnest(phone_digits(phones)) AS digits,
+                 generate_series(4, length(digits)) AS size
+        $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    """)
+
+    # Генерируемые колонки: пересчитываются при каждой записи phone_numbers,
+    # существующие строки заполняются при добавлении колонок
+    op.add_column('organizations', sa.Column(
+        'phone_digits',
+        postgresql.ARRAY(sa.Text()),
+        sa.Computed('phone_digits(phone_numbers)', persisted=True),
+        nullable=True,
+    ))
+    op.add_column('organizations', sa.Column(
+        'phone_suffixes',
+        postgresql.ARRAY(sa.Text()),
+        sa.Computed('phone_suffixes(phone_numbers)', persisted=True),
+        nullable=True,
+    ))
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_phone_suffixes")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_organizations_phone_suffixes "
+            "ON organizations USING gin (phone_suffixes)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_phone_suffixes")
+
+    op.drop_column('organizations', 'phone_suffixes')
+    op.drop_column('organizations', 'phone_digits')
+    op.execute("DROP FUNCTION phone_suffixes(character varying[])")
+    op.execute("DROP FUNCTION phone_digits(character varying[])")
@@ -0,0 +1,46 @@
+"""buildings postgis location
+
+Revision ID: 66955bf653e4
+Revises: 06c578399a09
+Create Date: 2026-10-18 15:55:31.733156
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '66955bf653e4'
+down_revision: Union[str, Sequence[str], None] = '06c578399a09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Колонка и индекс появляются только там, где PostGIS доступен.
+    # Приложение определяет бэкенд при старте по наличию колонки buildings.location
+    bind = op.get_bind()
+    available = bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'postgis')"
+    )).scalar()
+    if not available:
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    op.execute("""
+        ALTER TABLE buildings ADD COLUMN location geography(Point, 4326)
+        GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED
+    """)
+    # geography - для ST_DWithin по радиусу, geometry - для прямоугольника в координатах lat/lon
+    op.execute("CREATE INDEX ix_buildings_location ON buildings USING gist (location)")
+    op.execute("CREATE INDEX ix_buildings_location_geometry ON buildings USING gist (geometry(location))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_buildings_location_geometry")
+    op.execute("DROP INDEX IF EXISTS ix_buildings_location")
+    op.execute("ALTER TABLE buildings DROP COLUMN IF EXISTS location")
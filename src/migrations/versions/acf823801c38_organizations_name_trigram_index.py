@@ -0,0 +1,37 @@
+"""organizations name trigram index
+
+Revision ID: acf823801c38
+Revises: f81dff768f58
+Create Date: 2026-10-18 16:07:05.204465
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'acf823801c38'
+down_revision: Union[str, Sequence[str], None] = 'f81dff768f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY: индекс по названию строится без блокировки записи в organizations
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_name_trgm")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_organizations_name_trgm "
+            "ON organizations USING gin (name gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_name_trgm")
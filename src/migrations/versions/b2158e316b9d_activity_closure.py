@@ -0,0 +1,124 @@
+"""activity closure
+
+Revision ID: b2158e316b9d
+Revises: 1e3ac442b1d6
+Create Date: 2026-10-18 15:52:29.865570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2158e316b9d'
+down_revision: Union[str, Sequence[str], None] = '1e3ac442b1d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MAX_ACTIVITY_LEVEL = 3
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_descendant_id', 'activity_closure', ['descendant_id', 'ancestor_id'], unique=False)
+
+    # Заполняем по существующему дереву
+    op.execute("""
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE closure AS (
+            SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM activities
+            UNION ALL
+            SELECT closure.ancestor_id, activities.id, closure.depth + 1
+            FROM closure
+            JOIN activities ON activities.parent_id = closure.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM closure
+    """)
+
+    # Вставка: ссылка на себя + все предки родителя.
+    # Заодно проверяем вложенность (не глубже MAX_ACTIVITY_LEVEL уровней)
+    op.execute(f"""
+        CREATE FUNCTION activity_closure_insert() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.parent_id IS NOT NULL AND (
+                SELECT count(*) FROM activity_closure WHERE descendant_id = NEW.parent_id
+            ) >= {MAX_ACTIVITY_LEVEL} THEN
+                RAISE EXCEPTION 'activity nesting level cannot exceed {MAX_ACTIVITY_LEVEL}';
+            END IF;
+
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            SELECT NEW.id, NEW.id, 0
+            UNION ALL
+            SELECT ancestor_id, NEW.id, depth + 1
+            FROM activity_closure
+            WHERE descendant_id = NEW.parent_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER activities_closure_insert
+        AFTER INSERT ON activities
+        FOR EACH ROW EXECUTE FUNCTION activity_closure_insert()
+    """)
+
+    # Перенос: отрываем поддерево от старых предков и подвешиваем к новым
+    op.execute(f"""
+        CREATE FUNCTION activity_closure_move() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.parent_id IS NOT NULL AND EXISTS (
+                SELECT 1 FROM activity_closure
+                WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+            ) THEN
+                RAISE EXCEPTION 'activity cannot be moved under its own descendant';
+            END IF;
+
+            DELETE FROM activity_closure
+            WHERE descendant_id IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id)
+              AND ancestor_id NOT IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id);
+
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1
+            FROM activity_closure AS super
+            CROSS JOIN activity_closure AS sub
+            WHERE super.descendant_id = NEW.parent_id
+              AND sub.ancestor_id = NEW.id;
+
+            IF (
+                SELECT max(depth) + 1 FROM activity_closure
+                WHERE descendant_id IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id)
+            ) > {MAX_ACTIVITY_LEVEL} THEN
+                RAISE EXCEPTION 'activity nesting level cannot exceed {MAX_ACTIVITY_LEVEL}';
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER activities_closure_move
+        AFTER UPDATE OF parent_id ON activities
+        FOR EACH ROW WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE FUNCTION activity_closure_move()
+    """)
+    # Удаление обрабатывает ON DELETE CASCADE внешних ключей
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER activities_closure_move ON activities")
+    op.execute("DROP FUNCTION activity_closure_move()")
+    op.execute("DROP TRIGGER activities_closure_insert ON activities")
+    op.execute("DROP FUNCTION activity_closure_insert()")
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_table('activity_closure')
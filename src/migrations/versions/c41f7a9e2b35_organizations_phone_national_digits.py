@@ -0,0 +1,72 @@
+"""organizations phone national digits
+
+Revision ID: c41f7a9e2b35
+Revises: 503c7e2d32a4
+Create Date: 2026-10-18 18:02:11.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2b35'
+down_revision: Union[str, Sequence[str], None] = '503c7e2d32a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PHONE_DIGITS = """
+    CREATE OR REPLACE FUNCTION phone_digits(phones character varying[]) RETURNS text[] AS $$
+        SELECT coalesce(array_agg({digits}), '{{}}')
+        FROM unnest(phones) AS phone
+    $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+"""
+ONLY_DIGITS = "regexp_replace(phone, '\\D', '', 'g')"
+# 11 цифр с 8 или 7 в начале - российский номер: «8-923-666-13-13» и «+7 923 666-13-13» -> «9236661313».
+# То же делает normalize_phone в schemas.organization с номером из запроса
+NATIONAL_DIGITS = f"regexp_replace({ONLY_DIGITS}, '^[78](\\d{{10}})$', '\\1')"
+
+
+def recompute_phone_columns(digits: str):
+    """
+    Генерируемые колонки не пересчитываются при замене функции -
+    колонки и индекс пересоздаются, строки заполняются заново
+    """
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_organizations_phone_suffixes")
+
+    op.drop_column('organizations', 'phone_suffixes')
+    op.drop_column('organizations', 'phone_digits')
+    op.execute(PHONE_DIGITS.format(digits=digits))
+    op.add_column('organizations', sa.Column(
+        'phone_digits',
+        postgresql.ARRAY(sa.Text()),
+        sa.Computed('phone_digits(phone_numbers)', persisted=True),
+        nullable=True,
+    ))
+    op.add_column('organizations', sa.Column(
+        'phone_suffixes',
+        postgresql.ARRAY(sa.Text()),
+        sa.Computed('phone_suffixes(phone_numbers)', persisted=True),
+        nullable=True,
+    ))
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_organizations_phone_suffixes "
+            "ON organizations USING gin (phone_suffixes)"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    recompute_phone_columns(NATIONAL_DIGITS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    recompute_phone_columns(ONLY_DIGITS)
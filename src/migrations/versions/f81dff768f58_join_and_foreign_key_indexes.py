@@ -0,0 +1,68 @@
+"""join and foreign key indexes
+
+Revision ID: f81dff768f58
+Revises: 66955bf653e4
+Create Date: 2026-10-18 19:12:40.153207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81dff768f58'
+down_revision: Union[str, Sequence[str], None] = '66955bf653e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы строятся CONCURRENTLY: без блокировки записи, но только вне транзакции
+CONCURRENT_INDEXES = (
+    ('organization_activity_pkey', 'organization_activity', 'organization_id, activity_id', True),
+    ('ix_organization_activity_activity_id', 'organization_activity', 'activity_id, organization_id', False),
+    ('ix_organizations_building_id', 'organizations', 'building_id', False),
+    ('ix_activities_parent_id', 'activities', 'parent_id', False),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Под первичный ключ: без пустых ссылок и дублей связей
+    op.execute("DELETE FROM organization_activity WHERE organization_id IS NULL OR activity_id IS NULL")
+    op.execute("""
+        DELETE FROM organization_activity AS duplicate
+        USING organization_activity AS kept
+        WHERE duplicate.organization_id = kept.organization_id
+          AND duplicate.activity_id = kept.activity_id
+          AND duplicate.ctid > kept.ctid
+    """)
+    op.alter_column('organization_activity', 'organization_id', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('organization_activity', 'activity_id', existing_type=sa.Integer(), nullable=False)
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in CONCURRENT_INDEXES:
+            # Недостроенный после прерванного CONCURRENTLY индекс остаётся INVALID - пересоздаём
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY {name} ON {table} ({columns})"
+            )
+
+    # Готовый уникальный индекс становится первичным ключом без повторного построения
+    op.execute(
+        "ALTER TABLE organization_activity "
+        "ADD CONSTRAINT organization_activity_pkey PRIMARY KEY USING INDEX organization_activity_pkey"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('organization_activity_pkey', 'organization_activity', type_='primary')
+
+    with op.get_context().autocommit_block():
+        for name, _, _, unique in CONCURRENT_INDEXES:
+            if not unique:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    op.alter_column('organization_activity', 'activity_id', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('organization_activity', 'organization_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,78 @@
+"""
+Keyset-пагинация: курсор - непрозрачный токен с ключом сортировки последнего элемента страницы
+"""
+import base64
+import json
+
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+from exceptions import InvalidCursorException
+
+T = TypeVar("T")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(slots=True)
+class Page(Generic[T]):
+    items: list[T] = field(default_factory=list)
+    next_cursor: str | None = None
+
+
+def encode_cursor(order_by: str, key: list) -> str:
+    payload = json.dumps({"o": order_by, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+# Ключ сортировки по порядку: id или (оценка, id); оценка - расстояние, похожесть или ранг
+CURSOR_KEY_TYPES = {
+    "id": (int,),
+    "distance": (float, int),
+    "similarity": (float, int),
+    "rank": (float, int),
+}
+
+
+def _valid_key_element(value, expected: type) -> bool:
+    if isinstance(value, bool):
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str | None, order_by: str) -> tuple | None:
+    """
+    Ключ сортировки из курсора; курсор от другой сортировки или с ключом
+    не той длины и типов считается невалидным
+    """
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = payload["k"]
+        expected = CURSOR_KEY_TYPES[order_by]
+        if (
+            payload["o"] != order_by
+            or not isinstance(key, list)
+            or len(key) != len(expected)
+            or not all(map(_valid_key_element, key, expected))
+        ):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursorException
+    return tuple(key)
+
+
+def make_page(rows: list, limit: int, order_by: str, key, to_item) -> Page:
+    """
+    Страница из limit + 1 строк: лишняя строка лишь сообщает, что есть продолжение.
+    key(row) - ключ сортировки строки, to_item(row) - элемент ответа
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(order_by, list(key(items[-1])))
+    return Page(items=[to_item(row) for row in items], next_cursor=next_cursor)
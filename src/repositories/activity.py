@@ -1,33 +1,33 @@
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from bisect import bisect_right
+
 from sqlalchemy.ext.asyncio import AsyncSession
+from cache.activity_tree import ActivityTree, activity_tree
 from db.models import Activity
 from repositories.base import SQLAlchemyRepository
-from typing import Optional, Any, Dict
+from schemas.activity import ActivityResponse
+from typing import Optional, Any, Dict, List
 
 
 class ActivityRepository(SQLAlchemyRepository):
     model = Activity
+    tree: ActivityTree = activity_tree
+
+    async def get_tree(self, session: AsyncSession) -> ActivityTree:
+        """Актуальное дерево деятельностей из памяти процесса"""
+        return await self.tree.ensure_fresh(session)
 
     async def find_all(
             self,
             session: AsyncSession,
             filters: Optional[Dict[str, Any]] = None,
             limit: Optional[int] = 50,
-            offset: Optional[int] = 0
-    ):
-        stmt = (
-            select(self.model)
-            .options(
-                selectinload(self.model.children)
-                .selectinload(self.model.children)  # если нужна глубина 2
-            )
-            .limit(limit)
-            .offset(offset)
-        )
-
-        res = await session.execute(stmt)
-        return res.scalars().all()
+            offset: Optional[int] = 0,
+            after: Optional[tuple] = None,
+    ) -> List[ActivityResponse]:
+        tree = await self.get_tree(session)
+        start = bisect_right(tree.ids, after[-1]) if after is not None else 0
+        ids = tree.ids[start + offset:start + offset + limit]
+        return [tree.render(activity_id, depth=2) for activity_id in ids]
 
     async def get_activity_subtree_ids(
         self,
@@ -35,19 +35,7 @@ class ActivityRepository(SQLAlchemyRepository):
         root_activity_id: int,
     ) -> list[int]:
         """
-        Возвращает список id: [root, child1, child2, ...]
+        Возвращает список id: [root, child1, child2, ...] из дерева в памяти
         """
-        result_ids = []
-        stack = [root_activity_id]
-
-        while stack:
-            current_id = stack.pop()
-            result_ids.append(current_id)
-
-            stmt = select(Activity.id).where(Activity.parent_id == current_id)
-            res = await session.execute(stmt)
-            children_ids = [row[0] for row in res.all()]
-
-            stack.extend(children_ids)
-
-        return result_ids
+        tree = await self.get_tree(session)
+        return tree.subtree_ids([root_activity_id])
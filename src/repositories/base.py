@@ -5,6 +5,7 @@ from typing import Dict, Any, Optional
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache.query_cache import QueryCache, cached_query, entity_tag, query_cache, track_write
 from exceptions import (
     ModelAlreadyExistsException,
     ModelNoFoundException
@@ -32,27 +33,59 @@ class AbstractRepository(ABC):
 
 class SQLAlchemyRepository(AbstractRepository):
     """
-    Репозиторий для работы с sqlalchemy
+    Репозиторий для работы с sqlalchemy.
+    Чтения кэшируются в cache (cached_query), записи копят теги для инвалидации после commit
     """
     model = None
+    cache: QueryCache = query_cache
+
+    def _table_tags(self, **params) -> set[str]:
+        """Выборка зависит от всей таблицы: новая строка может попасть в любую страницу"""
+        return {self.model.__tablename__}
+
+    def _entity_tags(self, obj_id: int, **params) -> set[str]:
+        return {entity_tag(self.model.__tablename__, obj_id)}
+
+    def _result_tags(self, result) -> set[str]:
+        """Теги сущностей в результате: строки и ORM-объекты с id"""
+        items = result if isinstance(result, list) else [result]
+        return {
+            entity_tag(self.model.__tablename__, item.id)
+            for item in items
+            if getattr(item, "id", None) is not None
+        }
+
+    def _write_tags(self, obj) -> set[str]:
+        return {self.model.__tablename__, entity_tag(self.model.__tablename__, obj.id)}
 
     async def add_one(self, session: AsyncSession, data: dict):
         stmt = insert(self.model).values(**data).returning(self.model)
         try:
             res = await session.execute(stmt)
             # await session.commit()
-            return res.scalar_one()
+            obj = res.scalar_one()
         except IntegrityError:
             raise ModelAlreadyExistsException
+        track_write(session, self._write_tags(obj))
+        return obj
 
+    @cached_query(tags="_table_tags")
     async def find_all(
             self,
             session: AsyncSession,
             filters: Optional[Dict[str, Any]] = None,
             limit: Optional[int] = 50,
-            offset: Optional[int] = 0
+            offset: Optional[int] = 0,
+            after: Optional[tuple] = None,
     ):
-        stmt = select(self.model).limit(limit).offset(offset)
+        """
+        Стабильный порядок по первичному ключу; after - ключ последнего элемента
+        предыдущей страницы (keyset), чтобы глубокие страницы не читали offset строк
+        """
+        stmt = select(self.model).order_by(self.model.id).limit(limit).offset(offset)
+
+        if after is not None:
+            stmt = stmt.where(self.model.id > after[-1])
 
         if filters:
             # Фильтруем только те ключи, которые существуют в модели
@@ -73,6 +106,7 @@ class SQLAlchemyRepository(AbstractRepository):
         res = await session.execute(stmt)
         return res.scalars().all()
 
+    @cached_query(tags="_entity_tags")
     async def get_by_id(self, session: AsyncSession, obj_id: int):
         stmt = select(self.model).where(self.model.id == obj_id)
         try:
@@ -102,12 +136,14 @@ class SQLAlchemyRepository(AbstractRepository):
         try:
             res = await session.execute(stmt)
             # await session.commit()
-            return res.scalar_one()
+            obj = res.scalar_one()
         except NoResultFound:
             # await session.rollback()
             raise ModelNoFoundException
         except IntegrityError:
             # await session.rollback()
             raise ModelAlreadyExistsException
+        track_write(session, self._write_tags(obj))
+        return obj
 
 
@@ -1,58 +1,246 @@
+import math
+
 from sqlalchemy.exc import NoResultFound
 
 from exceptions import ModelNoFoundException
 from repositories.base import SQLAlchemyRepository
-from sqlalchemy.orm import relationship, joinedload, selectinload
-from sqlalchemy import select, func
-from db.models import Organization, Activity, Building
+from sqlalchemy import select, func, and_, or_, true, tuple_, literal, literal_column, bindparam, ARRAY, Integer, Float
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from cache.building_geo_index import BuildingGeoIndex, building_geo_index
+from cache.organization_names import OrganizationNameIndex, organization_name_index
+from cache.query_cache import cached_query, entity_tag
+from config import settings
+from geo import EARTH_RADIUS_KM, MAX_DISTANCE_KM, BoundingBox, bounding_boxes, geohash_ranges
+from db.models import Activity, Organization, Building, organization_activity, activity_closure
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+# Колонка geography(Point) из PostGIS-миграции, в модели не объявлена:
+# на Postgres без PostGIS её нет
+BUILDING_LOCATION = literal_column("buildings.location")
+
+# Поиск ближайших без PostGIS: стартовый радиус и во сколько раз он растёт на каждом шаге
+NEAREST_START_RADIUS_KM = 1.0
+NEAREST_RADIUS_GROWTH = 4
+
+
 class OrganizationRepository(SQLAlchemyRepository):
     model = Organization
+    geo_index: BuildingGeoIndex = building_geo_index
+    name_index: OrganizationNameIndex = organization_name_index
+
+    async def get_name_index(self, session: AsyncSession) -> OrganizationNameIndex:
+        """Актуальный префиксный индекс названий из памяти процесса"""
+        return await self.name_index.ensure_fresh(session)
+
+    # ---------- ТЕГИ КЭША ----------
+    def _table_tags(self, filters: dict | None = None, activity_ids: list[int] | None = None, **params) -> set[str]:
+        """Отбор по деятельности зависит и от дерева: поддерево берётся из activity_closure"""
+        tags = {Organization.__tablename__}
+        if activity_ids is not None or (filters and "activity_id" in filters):
+            tags.add(Activity.__tablename__)
+        return tags
+
+    def _geo_tags(self, **params) -> set[str]:
+        """Геовыборка меняется и при переносе здания"""
+        return {Organization.__tablename__, Building.__tablename__}
+
+    def _geo_variant(self) -> dict:
+        """Бэкенды считают расстояние по-разному: результаты одного не отдаются за другой"""
+        return {"geo_backend": settings.geo_backend, "geo_engine": settings.geo_engine}
+
+    def _search_tags(self, **params) -> set[str]:
+        """search_vector собирается из названия, деятельностей и адреса здания"""
+        return {Organization.__tablename__, Building.__tablename__, Activity.__tablename__}
 
-    # ---------- ОБЩИЙ eager load ----------
-    def _base_stmt(self):
+    def _result_tags(self, result) -> set[str]:
+        """В строках чтения есть адрес и координаты здания"""
+        items = result if isinstance(result, list) else [result]
+        return super()._result_tags(result) | {
+            entity_tag(Building.__tablename__, item.building_id)
+            for item in items
+            if getattr(item, "building_id", None) is not None
+        }
+
+    # ---------- ПРОЕКЦИЯ ЧТЕНИЯ ----------
+    # Плоские строки из колонок организации и здания, без ORM-сущностей и eager load
+    def _read_stmt(self, *extra):
+        """
+        Чтение без ORM: явные колонки организации и здания, id деятельностей - массивом
+        из индекса organization_activity. Строки - обычные Row без identity map и загрузчиков,
+        сами деятельности сервис берёт из дерева в памяти
+        """
+        activity_ids = (
+            select(func.array_agg(
+                aggregate_order_by(organization_activity.c.activity_id, organization_activity.c.activity_id)
+            ))
+            .where(organization_activity.c.organization_id == Organization.id)
+            .scalar_subquery()
+        )
         return (
-            select(self.model)
-            .join(self.model.building)
-            .options(
-                selectinload(self.model.building),
-                selectinload(self.model.activities)
-                .selectinload(Activity.children),
+            select(
+                Organization.id,
+                Organization.name,
+                Organization.building_id,
+                Organization.phone_numbers,
+                Building.address,
+                Building.latitude,
+                Building.longitude,
+                activity_ids.label("activity_ids"),
+                *extra,
             )
+            .select_from(Organization)
+            .join(Building, Building.id == Organization.building_id)
         )
 
-    # ---------- В РАДИУСЕ ----------
-    async def find_within_radius(
+    def _geo_page_stmt(
             self,
-            session: AsyncSession,
-            latitude: float,
-            longitude: float,
-            radius_km: float,
+            condition,
+            distance,
+            limit: int,
+            order_by: str,
+            after: tuple | None,
+            candidates=None,
     ):
-        earth_radius = 6371  # км
+        """
+        Страница геопоиска: строки чтения с distance_km в порядке id
+        или (distance, id), продолжение - строго после ключа after
+        """
+        stmt = self._read_stmt(distance.label("distance_km"))
+        if candidates is not None:
+            stmt = stmt.join(candidates, candidates.c.building_id == self.model.building_id)
+
+        stmt = stmt.where(condition)
+
+        if order_by == "distance":
+            if after is not None:
+                stmt = stmt.where(tuple_(distance, self.model.id) > tuple_(*after))
+            stmt = stmt.order_by(distance, self.model.id)
+        else:
+            if after is not None:
+                stmt = stmt.where(self.model.id > after[-1])
+            stmt = stmt.order_by(self.model.id)
+
+        return stmt.limit(limit)
 
-        distance_expr = (
-                earth_radius
-                * func.acos(
-            func.cos(func.radians(latitude))
+    # ---------- ГЕО-УСЛОВИЯ ----------
+    @staticmethod
+    def _distance_expr(latitude: float, longitude: float):
+        """Haversine в SQL: без NaN от округления, в отличие от acos(...)"""
+        half_d_lat = func.sin(func.radians(Building.latitude - latitude) / 2)
+        half_d_lon = func.sin(func.radians(Building.longitude - longitude) / 2)
+        a = (
+            half_d_lat * half_d_lat
+            + math.cos(math.radians(latitude))
             * func.cos(func.radians(Building.latitude))
-            * func.cos(func.radians(Building.longitude) - func.radians(longitude))
-            + func.sin(func.radians(latitude))
-            * func.sin(func.radians(Building.latitude))
+            * half_d_lon * half_d_lon
         )
+        return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(1.0, a)))
+
+    @staticmethod
+    def _bbox_condition(boxes: list[BoundingBox]):
+        """
+        Префильтр по прямоугольникам: несколько диапазонов индекса по geohash
+        плюс точная проверка границ прямоугольников
+        """
+        return and_(
+            or_(*(
+                and_(Building.geohash >= start, Building.geohash < end)
+                for start, end in geohash_ranges(boxes)
+            )),
+            or_(*(
+                and_(
+                    Building.latitude.between(min_lat, max_lat),
+                    Building.longitude.between(min_lon, max_lon),
+                )
+                for min_lat, max_lat, min_lon, max_lon in boxes
+            )),
         )
 
-        stmt = (
-            self._base_stmt()
-            .where(distance_expr <= radius_km)
+    @staticmethod
+    def _postgis_point(latitude: float, longitude: float):
+        return func.geography(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326))
+
+    def _radius_condition(self, latitude: float, longitude: float, radius_km: float):
+        if settings.geo_backend == "postgis":
+            # Сфера, а не сфероид - чтобы расстояния совпадали с haversine
+            return func.ST_DWithin(
+                BUILDING_LOCATION,
+                self._postgis_point(latitude, longitude),
+                radius_km * 1000,
+                False,
+            )
+
+        return and_(
+            self._bbox_condition(bounding_boxes(latitude, longitude, radius_km)),
+            self._distance_expr(latitude, longitude) <= radius_km,
         )
 
+    def _rectangle_condition(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+        if settings.geo_backend == "postgis":
+            return and_(
+                func.geometry(BUILDING_LOCATION).op("&&")(
+                    func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+                ),
+                Building.latitude.between(min_lat, max_lat),
+                Building.longitude.between(min_lon, max_lon),
+            )
+
+        return self._bbox_condition([(min_lat, max_lat, min_lon, max_lon)])
+
+    def _distance_to(self, latitude: float, longitude: float):
+        """Расстояние от здания до точки в км для текущего бэкенда"""
+        if settings.geo_backend == "postgis":
+            return func.ST_Distance(BUILDING_LOCATION, self._postgis_point(latitude, longitude), False) / 1000
+        return self._distance_expr(latitude, longitude)
+
+    @staticmethod
+    def _candidates(building_ids, distances, after: tuple | None, order_by: str):
+        """
+        Здания, найденные движком в памяти, как производная таблица unnest(ids, distances):
+        два параметра-массива вместо длинного IN
+        """
+        if order_by == "distance" and after is not None:
+            keep = distances >= after[0]
+            building_ids, distances = building_ids[keep], distances[keep]
+
+        return func.unnest(
+            bindparam("building_ids", building_ids.tolist(), type_=ARRAY(Integer)),
+            bindparam("distances", distances.tolist(), type_=ARRAY(Float)),
+        ).table_valued("building_id", "distance_km").render_derived(name="candidates")
+
+    # ---------- В РАДИУСЕ ----------
+    @cached_query(tags="_geo_tags", variant="_geo_variant")
+    async def find_within_radius(
+            self,
+            session: AsyncSession,
+            latitude: float,
+            longitude: float,
+            radius_km: float,
+            limit: int = 50,
+            order_by: str = "id",
+            after: tuple | None = None,
+    ):
+        if settings.geo_engine == "numpy":
+            index = await self.geo_index.ensure_fresh(session)
+            candidates = self._candidates(
+                *index.within_radius(latitude, longitude, radius_km), after, order_by
+            )
+            stmt = self._geo_page_stmt(
+                true(), candidates.c.distance_km, limit, order_by, after, candidates
+            )
+        else:
+            stmt = self._geo_page_stmt(
+                self._radius_condition(latitude, longitude, radius_km),
+                self._distance_to(latitude, longitude),
+                limit, order_by, after,
+            )
+
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.all()
 
     # ---------- В ПРЯМОУГОЛЬНИКЕ ----------
+    @cached_query(tags="_geo_tags", variant="_geo_variant")
     async def find_within_rectangle(
             self,
             session: AsyncSession,
@@ -60,97 +248,335 @@ class OrganizationRepository(SQLAlchemyRepository):
             max_lat: float,
             min_lon: float,
             max_lon: float,
+            limit: int = 50,
+            order_by: str = "id",
+            after: tuple | None = None,
+    ):
+        """Расстояние считается от центра прямоугольника"""
+        center = ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+
+        if settings.geo_engine == "numpy":
+            index = await self.geo_index.ensure_fresh(session)
+            candidates = self._candidates(
+                *index.within_rectangle(min_lat, max_lat, min_lon, max_lon, *center), after, order_by
+            )
+            stmt = self._geo_page_stmt(
+                true(), candidates.c.distance_km, limit, order_by, after, candidates
+            )
+        else:
+            stmt = self._geo_page_stmt(
+                self._rectangle_condition(min_lat, max_lat, min_lon, max_lon),
+                self._distance_to(*center),
+                limit, order_by, after,
+            )
+
+        res = await session.execute(stmt)
+        return res.all()
+
+
+    # ---------- КЛАСТЕРЫ ----------
+    @cached_query(tags="_geo_tags", variant="_geo_variant")
+    async def cluster_within_rectangle(
+            self,
+            session: AsyncSession,
+            min_lat: float,
+            max_lat: float,
+            min_lon: float,
+            max_lon: float,
+            cell_lat: float,
+            cell_lon: float,
+            origin_lat: float = 0.0,
+            origin_lon: float = 0.0,
+            top_activities: int = 3,
     ):
+        """
+        Агрегация организаций в прямоугольнике по ячейкам сетки одним запросом:
+        строки (latitude, longitude, count, activity_ids) - центроид ячейки,
+        число организаций и самые частые деятельности в ней
+        """
+        points = (
+            select(
+                self.model.id.label("organization_id"),
+                Building.latitude,
+                Building.longitude,
+                func.floor((Building.latitude - origin_lat) / cell_lat).label("cell_y"),
+                func.floor((Building.longitude - origin_lon) / cell_lon).label("cell_x"),
+            )
+            .join(self.model.building)
+            .where(self._rectangle_condition(min_lat, max_lat, min_lon, max_lon))
+            .cte("points")
+        )
+
+        cells = (
+            select(
+                points.c.cell_y,
+                points.c.cell_x,
+                func.avg(points.c.latitude).label("latitude"),
+                func.avg(points.c.longitude).label("longitude"),
+                func.count().label("count"),
+            )
+            .group_by(points.c.cell_y, points.c.cell_x)
+            .cte("cells")
+        )
+
+        activity_count = func.count()
+        ranked_activities = (
+            select(
+                points.c.cell_y,
+                points.c.cell_x,
+                organization_activity.c.activity_id,
+                func.row_number().over(
+                    partition_by=(points.c.cell_y, points.c.cell_x),
+                    order_by=(activity_count.desc(), organization_activity.c.activity_id),
+                ).label("rank"),
+            )
+            .join(organization_activity, organization_activity.c.organization_id == points.c.organization_id)
+            .group_by(points.c.cell_y, points.c.cell_x, organization_activity.c.activity_id)
+            .cte("ranked_activities")
+        )
+
         stmt = (
-            self._base_stmt()
-            .where(
-                Building.latitude.between(min_lat, max_lat),
-                Building.longitude.between(min_lon, max_lon),
+            select(
+                cells.c.latitude,
+                cells.c.longitude,
+                cells.c.count,
+                func.coalesce(
+                    func.array_agg(
+                        aggregate_order_by(ranked_activities.c.activity_id, ranked_activities.c.rank)
+                    ).filter(ranked_activities.c.activity_id.is_not(None)),
+                    literal([], ARRAY(Integer)),
+                ).label("activity_ids"),
             )
+            .select_from(cells)
+            .outerjoin(
+                ranked_activities,
+                and_(
+                    ranked_activities.c.cell_y == cells.c.cell_y,
+                    ranked_activities.c.cell_x == cells.c.cell_x,
+                    ranked_activities.c.rank <= top_activities,
+                ),
+            )
+            .group_by(cells.c.cell_y, cells.c.cell_x, cells.c.latitude, cells.c.longitude, cells.c.count)
+            .order_by(cells.c.cell_y, cells.c.cell_x)
         )
 
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.all()
 
+    # ---------- БЛИЖАЙШИЕ ----------
+    @cached_query(tags="_geo_tags", variant="_geo_variant")
+    async def find_nearest(
+            self,
+            session: AsyncSession,
+            latitude: float,
+            longitude: float,
+            k: int,
+    ):
+        """
+        k ближайших организаций: строки чтения с distance_km по возрастанию расстояния.
+        PostGIS - KNN-сортировка по GiST индексу, иначе область поиска расширяется,
+        пока в неё не попадут k организаций: всё, что снаружи, гарантированно дальше
+        """
+        if settings.geo_engine == "numpy":
+            return await self._find_nearest_in_memory(session, latitude, longitude, k)
 
+        if settings.geo_backend == "postgis":
+            point = self._postgis_point(latitude, longitude)
+            stmt = (
+                self._read_stmt(self._distance_to(latitude, longitude).label("distance_km"))
+                .order_by(BUILDING_LOCATION.op("<->")(point), self.model.id)
+                .limit(k)
+            )
+            res = await session.execute(stmt)
+            return sorted(res.all(), key=lambda row: (row.distance_km, row.id))
+
+        radius_km = NEAREST_START_RADIUS_KM
+        while True:
+            rows = await self.find_within_radius(
+                session, latitude, longitude, radius_km, limit=k, order_by="distance",
+            )
+            if len(rows) >= k or radius_km >= MAX_DISTANCE_KM:
+                return rows
+            radius_km = min(radius_km * NEAREST_RADIUS_GROWTH, MAX_DISTANCE_KM)
+
+    async def _find_nearest_in_memory(
+            self,
+            session: AsyncSession,
+            latitude: float,
+            longitude: float,
+            k: int,
+    ):
+        """Здания берутся по возрастанию расстояния, пока среди них не найдётся k организаций"""
+        index = await self.geo_index.ensure_fresh(session)
+
+        buildings_count = k
+        while True:
+            building_ids, distances = index.nearest(latitude, longitude, buildings_count)
+            candidates = self._candidates(building_ids, distances, None, "distance")
+            stmt = self._geo_page_stmt(
+                true(), candidates.c.distance_km, k, "distance", None, candidates
+            )
+            rows = (await session.execute(stmt)).all()
+            if len(rows) >= k or buildings_count >= len(index.ids):
+                return rows
+            buildings_count *= 2
+
+    def _activity_filter(self, activity_ids: list[int], include_descendants: bool = False):
+        """
+        Полусоединение (EXISTS) с organization_activity: организация попадает в выборку
+        один раз, сколько бы её деятельностей ни совпало, поэтому LIMIT считает организации.
+        Подзапрос идёт по индексу (activity_id, organization_id)
+        """
+        matches = select(organization_activity.c.organization_id).where(
+            organization_activity.c.organization_id == self.model.id,
+        )
+        if include_descendants:
+            matches = matches.join(
+                activity_closure,
+                activity_closure.c.descendant_id == organization_activity.c.activity_id,
+            ).where(activity_closure.c.ancestor_id.in_(activity_ids))
+        else:
+            matches = matches.where(organization_activity.c.activity_id.in_(activity_ids))
+        return matches.exists()
+
+    @cached_query(tags="_table_tags")
     async def find_by_activity_ids(
             self,
             session: AsyncSession,
             activity_ids: list[int],
             limit: int = 50,
             offset: int = 0,
+            include_descendants: bool = False,
+            after: tuple | None = None,
     ):
-        stmt = (
-            select(self.model)
-            .join(self.model.activities)
-            .where(Activity.id.in_(activity_ids))
-            .limit(limit).offset(offset)
-            .options(
-                selectinload(self.model.building),
-                selectinload(self.model.activities)
-                .selectinload(Activity.children),
-            )
-        )
+        """
+        Организации по списку id деятельностей.
+        include_descendants - также по всем вложенным деятельностям:
+        поддерево берётся одним индексным join с activity_closure, без рекурсии
+        """
+        stmt = self._read_stmt().where(self._activity_filter(activity_ids, include_descendants))
+
+        if after is not None:
+            stmt = stmt.where(self.model.id > after[-1])
+
+        stmt = stmt.order_by(self.model.id).limit(limit).offset(offset)
 
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.all()
 
+    @cached_query(tags="_table_tags")
     async def find_all(
             self,
             session: AsyncSession,
             filters: dict | None = None,
             limit: int = 50,
             offset: int = 0,
+            after: tuple | None = None,
     ):
-        stmt = (
-            select(Organization)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities)
-                .selectinload(Activity.children),
-            ).limit(limit).offset(offset)
-        )
+        stmt = self._read_stmt().order_by(Organization.id).limit(limit).offset(offset)
+
+        if after is not None:
+            stmt = stmt.where(Organization.id > after[-1])
 
         if filters:
-            conditions = []
+            stmt = stmt.where(*self._filter_conditions(filters))
+
+        res = await session.execute(stmt)
+        return res.all()
 
-            # обычные фильтры по полям Organization
-            if "building_id" in filters:
-                conditions.append(Organization.building_id == filters["building_id"])
+    @cached_query(tags="_table_tags")
+    async def search_by_name(
+            self,
+            session: AsyncSession,
+            name: str,
+            filters: dict | None = None,
+            limit: int = 50,
+            after: tuple | None = None,
+            include_descendants: bool = False,
+    ):
+        """
+        Поиск по похожести названия (pg_trgm): устойчив к опечаткам, лучшие совпадения первыми.
+        Отбор - оператором %> по GIN-индексу триграмм, порядок (similarity desc, id),
+        строки чтения с similarity
+        """
+        similarity = func.word_similarity(name, Organization.name, type_=Float)
+        stmt = self._read_stmt(similarity.label("similarity")).where(Organization.name.op("%>")(name))
 
-            if "name" in filters:
-                conditions.append(Organization.name.ilike(f"%{filters['name']}%"))
+        if filters:
+            stmt = stmt.where(*self._filter_conditions(filters, include_descendants))
 
-            # ⚠️ activity_id — через JOIN
-            if "activity_id" in filters:
-                stmt = stmt.join(Organization.activities).where(
-                    Activity.id == filters["activity_id"]
-                )
+        if after is not None:
+            score, organization_id = after
+            stmt = stmt.where(or_(
+                similarity < score,
+                and_(similarity == score, Organization.id > organization_id),
+            ))
 
-            if conditions:
-                stmt = stmt.where(*conditions)
+        stmt = stmt.order_by(similarity.desc(), Organization.id).limit(limit)
+        res = await session.execute(stmt)
+        return res.all()
+
+    @cached_query(tags="_search_tags")
+    async def search_full_text(
+            self,
+            session: AsyncSession,
+            query: str,
+            limit: int = 50,
+            after: tuple | None = None,
+    ):
+        """
+        Полнотекстовый поиск (russian) сразу по названию, деятельностям и адресу
+        одним запросом по GIN-индексу search_vector.
+        Порядок (rank desc, id), строки чтения с rank
+        """
+        ts_query = func.websearch_to_tsquery("russian", query)
+        rank = func.ts_rank_cd(Organization.search_vector, ts_query, type_=Float)
+        stmt = self._read_stmt(rank.label("rank")).where(Organization.search_vector.op("@@")(ts_query))
 
+        if after is not None:
+            score, organization_id = after
+            stmt = stmt.where(or_(
+                rank < score,
+                and_(rank == score, Organization.id > organization_id),
+            ))
+
+        stmt = stmt.order_by(rank.desc(), Organization.id).limit(limit)
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.all()
+
+    def _filter_conditions(self, filters: dict, include_descendants: bool = False) -> list:
+        conditions = []
 
+        # обычные фильтры по полям Organization
+        if "building_id" in filters:
+            conditions.append(Organization.building_id == filters["building_id"])
+
+        # ilike по подстроке тоже идёт по GIN-индексу триграмм
+        if "name" in filters:
+            conditions.append(Organization.name.ilike(f"%{filters['name']}%"))
+
+        if "activity_id" in filters:
+            conditions.append(self._activity_filter([filters["activity_id"]], include_descendants))
+
+        # Номер уже приведён к цифрам: отбор по GIN-индексу хвостов, точное совпадение - доп. проверкой
+        if "phone" in filters:
+            conditions.append(Organization.phone_suffixes.contains([filters["phone"]]))
+            if filters.get("phone_match") == "exact":
+                conditions.append(Organization.phone_digits.contains([filters["phone"]]))
+
+        return conditions
+
+    @cached_query(tags="_entity_tags")
     async def get_by_id(
             self,
             session: AsyncSession,
             obj_id: int,
     ):
-        stmt = (
-            select(Organization)
-            .where(Organization.id == obj_id)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.activities)
-                .selectinload(Activity.children),
-            )
-        )
+        stmt = self._read_stmt().where(Organization.id == obj_id)
 
         try:
             res = await session.execute(stmt)
-            return res.scalar_one()
+            return res.one()
 
         except NoResultFound:
             raise ModelNoFoundException
@@ -0,0 +1,86 @@
+"""
+Разбивка времени запроса для заголовка Server-Timing: сколько SQL-запросов ушло в БД,
+сколько времени они заняли и сколько ушло на сериализацию ответа.
+Счётчики живут в contextvar запроса; SQL считают хуки движка из create_session_maker,
+так что N+1 виден по числу запросов без профилировщика
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    queries: int = 0
+    db_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        return ", ".join((
+            f"db;dur={self.db_seconds * 1000:.2f}",
+            f'queries;desc="{self.queries}"',
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            f"total;dur={total_seconds * 1000:.2f}",
+        ))
+
+
+# Вне запроса (старт приложения, фоновые задачи) счётчиков нет
+request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    timings = request_timings.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(context):
+    # after_cursor_execute для упавшего statement не вызывается
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Хуки на синхронный движок под AsyncEngine: время каждого statement и их число"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def measure_serialization():
+    """Время блока добавляется к фазе serialize текущего запроса"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = request_timings.get()
+        if timings is not None:
+            timings.serialize_seconds += time.perf_counter() - started
+
+
+async def server_timing(request: Request, call_next):
+    """Middleware: счётчики на время запроса и заголовок Server-Timing в ответе"""
+    started = time.perf_counter()
+    # Объект кладётся до call_next: обработчик работает в копии контекста и меняет тот же объект
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    response.headers[SERVER_TIMING_HEADER] = timings.server_timing(time.perf_counter() - started)
+    return response
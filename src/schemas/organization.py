@@ -1,8 +1,30 @@
+import math
+import re
+
 from pydantic import BaseModel, ConfigDict, Field, model_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 from schemas.building import BuildingResponse
 from schemas.activity import ActivityResponse
 
+# Кластеров по стороне одного тайла карты при заданном zoom
+CLUSTER_CELLS_PER_TILE = 4
+CLUSTER_TOP_ACTIVITIES = 3
+# Предел ячеек сетки на запрос - столько же, сколько даёт максимальный grid_size
+CLUSTER_MAX_CELLS = 64 * 64
+
+# Минимум цифр для поиска по телефону: короче хвосты не хранятся в phone_suffixes (см. миграцию)
+PHONE_MIN_DIGITS = 4
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Цифры номера без кода страны: «8 (923) 666-13-13» и «+7 923 666-13-13» -> «9236661313».
+    Так же в БД нормализует phone_digits (см. миграцию c41f7a9e2b35)
+    """
+    digits = re.sub(r"\D", "", phone)
+    return re.sub(r"^[78](\d{10})$", r"\1", digits)
+
+
 class PaginationParams(BaseModel):
     limit: int = Field(
         50,
@@ -15,6 +37,10 @@ class PaginationParams(BaseModel):
         ge=0,
         description="Смещение выборки",
     )
+    cursor: Optional[str] = Field(
+        None,
+        description="Курсор следующей страницы из заголовка X-Next-Cursor",
+    )
 
 
 class OrganizationBase(BaseModel):
@@ -45,16 +71,42 @@ class OrganizationResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrganizationDistanceResponse(OrganizationResponse):
+    distance_km: Optional[float] = None
+
+
 # Специальные схемы для запросов
+class ActivityDepthParams(BaseModel):
+    activity_depth: int = Field(
+        0,
+        ge=0,
+        le=2,
+        description="Вложенность деятельностей в ответе: 0 - без дочерних, 1 - с дочерними, 2 - ещё уровень ниже",
+    )
+
+
+class GeoPageParams(ActivityDepthParams):
+    limit: int = Field(50, ge=1, le=100, description="Количество элементов в ответе")
+    cursor: Optional[str] = Field(None, description="Курсор следующей страницы из заголовка X-Next-Cursor")
+    order_by: Literal["id", "distance"] = Field(
+        "id",
+        description="Сортировка: по id или по расстоянию от центра поиска",
+    )
+
+
 class CoordinateRequest(BaseModel):
     latitude: float = Field( ..., ge=-90, le=90, description="Широта центра поиска",)
     longitude: float = Field( ..., ge=-180, le=180, description="Долгота центра поиска",)
 
 
-class RadiusSearchRequest(CoordinateRequest):
+class RadiusSearchRequest(CoordinateRequest, GeoPageParams):
     radius_km: float = Field(..., gt=0, description="Радиус в километрах",)
 
 
+class NearestSearchRequest(CoordinateRequest, ActivityDepthParams):
+    k: int = Field(10, ge=1, le=100, description="Сколько ближайших организаций вернуть")
+
+
 class OrganizationSearchRequest(BaseModel):
     name: Optional[str] = None
     activity_id: Optional[int] = None
@@ -65,11 +117,28 @@ class OrganizationFilter(BaseModel):
     building_id: int | None = None
     activity_id: int | None = None
     name: str | None = None
+    phone: str | None = None
+    phone_match: Literal["suffix", "exact"] | None = None
 
-class OrganizationListParams(PaginationParams):
+class OrganizationListParams(PaginationParams, ActivityDepthParams):
     building_id: int | None = Field(None, description="ID здания")
     activity_id: int | None = Field(None, description="ID деятельности")
     name: str | None = Field(None, description="Поиск по названию")
+    name_match: Literal["contains", "similar"] = Field(
+        "contains",
+        description="contains - подстрока в названии, similar - по похожести с учётом опечаток, "
+                    "лучшие совпадения первыми",
+    )
+
+    phone: str | None = Field(
+        None,
+        pattern=rf"^\D*(\d\D*){{{PHONE_MIN_DIGITS},}}$",
+        description="Телефон в любом формате, от 4 цифр",
+    )
+    phone_match: Literal["suffix", "exact"] = Field(
+        "suffix",
+        description="suffix - номер оканчивается на указанные цифры, exact - номер целиком",
+    )
 
     include_subactivities: bool = Field(
         False,
@@ -81,9 +150,32 @@ class OrganizationListParams(PaginationParams):
             building_id=self.building_id,
             activity_id=self.activity_id,
             name=self.name,
+            phone=normalize_phone(self.phone) if self.phone else None,
+            phone_match=self.phone_match if self.phone else None,
         )
 
-class RectangleSearchRequest(BaseModel):
+class FullTextSearchRequest(ActivityDepthParams):
+    q: str = Field(
+        ...,
+        min_length=1,
+        max_length=200,
+        description="Запрос по названию, деятельностям и адресу, например «мясная продукция Блюхера»",
+    )
+    limit: int = Field(50, ge=1, le=100, description="Количество элементов в ответе")
+    cursor: Optional[str] = Field(None, description="Курсор следующей страницы из заголовка X-Next-Cursor")
+
+
+class SuggestRequest(BaseModel):
+    q: str = Field(..., min_length=1, max_length=100, description="Начало названия организации")
+    limit: int = Field(10, ge=1, le=20, description="Количество подсказок")
+
+
+class OrganizationSuggestion(BaseModel):
+    id: int
+    name: str
+
+
+class RectangleArea(BaseModel):
     min_lat: float = Field(..., ge=-90, le=90,description="Широта первого угла прямоугольника")
     max_lat: float = Field(..., ge=-90, le=90, description="Широта второго угла прямоугольника")
     min_lon: float = Field(..., ge=-180, le=180, description="Долгота первого угла прямоугольника")
@@ -98,3 +190,57 @@ class RectangleSearchRequest(BaseModel):
             raise ValueError("min_lon must be less than or equal to max_lon")
 
         return self
+
+
+class RectangleSearchRequest(RectangleArea, GeoPageParams):
+    pass
+
+
+class ClusterRequest(RectangleArea):
+    zoom: Optional[int] = Field(
+        None,
+        ge=0,
+        le=22,
+        description="Уровень зума карты: сетка привязана к миру и не сдвигается при панорамировании",
+    )
+    grid_size: int = Field(
+        8,
+        ge=1,
+        le=64,
+        description="Число ячеек по каждой стороне области, если zoom не указан",
+    )
+
+    @model_validator(mode="after")
+    def limit_cell_count(self):
+        # По zoom размер ячейки не зависит от области: большая область при крупном zoom
+        # дала бы миллионы групп в GROUP BY. Zoom уменьшается, пока сетка не уложится в предел,
+        # - сетка остаётся привязанной к миру, кластеры просто крупнее
+        while self.zoom and self.cell_count() > CLUSTER_MAX_CELLS:
+            self.zoom -= 1
+        return self
+
+    def cell_count(self) -> int:
+        """Сколько ячеек сетки пересекает область (с учётом неполных на краях)"""
+        lat_step, lon_step, lat_origin, lon_origin = self.cell_size()
+        rows = math.floor((self.max_lat - lat_origin) / lat_step) - math.floor((self.min_lat - lat_origin) / lat_step)
+        columns = math.floor((self.max_lon - lon_origin) / lon_step) - math.floor((self.min_lon - lon_origin) / lon_step)
+        return (rows + 1) * (columns + 1)
+
+    def cell_size(self) -> tuple[float, float, float, float]:
+        """(шаг по широте, шаг по долготе, начало сетки по широте, по долготе) в градусах"""
+        if self.zoom is not None:
+            cell = 360 / 2 ** self.zoom / CLUSTER_CELLS_PER_TILE
+            return cell, cell, 0.0, 0.0
+        return (
+            max(self.max_lat - self.min_lat, 1e-9) / self.grid_size,
+            max(self.max_lon - self.min_lon, 1e-9) / self.grid_size,
+            self.min_lat,
+            self.min_lon,
+        )
+
+
+class OrganizationClusterResponse(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    activity_ids: List[int]
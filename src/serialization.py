@@ -0,0 +1,28 @@
+"""
+JSON-ответы через заранее собранные TypeAdapter: модели пишутся в байты одним проходом
+pydantic-core, без повторной проверки по response_model и без jsonable_encoder.
+response_model у маршрутов остаётся только для схемы OpenAPI
+"""
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from pagination import NEXT_CURSOR_HEADER, Page
+from request_timing import measure_serialization
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+
+def json_response(adapter: TypeAdapter, content) -> JSONBytesResponse:
+    with measure_serialization():
+        body = adapter.dump_json(content)
+    return JSONBytesResponse(body)
+
+
+def page_response(adapter: TypeAdapter, page: Page) -> JSONBytesResponse:
+    """Элементы страницы в теле, курсор продолжения - в заголовке X-Next-Cursor"""
+    response = json_response(adapter, page.items)
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return response
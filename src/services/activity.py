@@ -1,6 +1,7 @@
 from services.unit_of_work import UnitOfWork
 from repositories.activity import ActivityRepository
-from typing import List, Optional
+from typing import Optional
+from pagination import Page, decode_cursor, make_page
 from schemas.activity import ActivityResponse
 
 class ActivityService:
@@ -13,5 +14,20 @@ class ActivityService:
         self.repository = repository
         self.uow = uow
 
-    async def get_activities(self, limit: Optional[int] = 50, offset: Optional[int] = 0) -> List[ActivityResponse]:
-        return await self.repository.find_all(self.uow.session,limit=limit, offset=offset)
+    async def get_activities(
+            self,
+            limit: Optional[int] = 50,
+            offset: Optional[int] = 0,
+            cursor: Optional[str] = None,
+    ) -> Page[ActivityResponse]:
+        activities = await self.repository.find_all(
+            self.uow.session,
+            limit=limit + 1,
+            offset=offset,
+            after=decode_cursor(cursor, "id"),
+        )
+        return make_page(
+            activities, limit, "id",
+            key=lambda item: (item.id,),
+            to_item=ActivityResponse.model_validate,
+        )
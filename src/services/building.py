@@ -1,6 +1,7 @@
 from repositories.building import BuildingRepository
 from services.unit_of_work import UnitOfWork
-from typing import Optional, List
+from typing import Optional
+from pagination import Page, decode_cursor, make_page
 from schemas.building import BuildingResponse
 
 class BuildingService:
@@ -13,5 +14,20 @@ class BuildingService:
         self.repository = repository
         self.uow = uow
 
-    async def get_buildings(self, limit: Optional[int] = 50, offset: Optional[int] = 0) -> List[BuildingResponse]:
-        return await self.repository.find_all(self.uow.session,limit=limit, offset=offset)
+    async def get_buildings(
+            self,
+            limit: Optional[int] = 50,
+            offset: Optional[int] = 0,
+            cursor: Optional[str] = None,
+    ) -> Page[BuildingResponse]:
+        buildings = await self.repository.find_all(
+            self.uow.session,
+            limit=limit + 1,
+            offset=offset,
+            after=decode_cursor(cursor, "id"),
+        )
+        return make_page(
+            buildings, limit, "id",
+            key=lambda item: (item.id,),
+            to_item=BuildingResponse.model_validate,
+        )
@@ -1,15 +1,34 @@
 from typing import List
 
+from cache.activity_tree import ActivityTree
 from db.models import Organization
 from exceptions import OrganizationNoFoundException, ModelNoFoundException
 from repositories.organization import OrganizationRepository
 from repositories.activity import ActivityRepository
+from services.single_flight import SingleFlight, coalesced, single_flight
 from services.unit_of_work import UnitOfWork
 
-from schemas.organization import OrganizationFilter, RadiusSearchRequest, RectangleSearchRequest
+from schemas.building import BuildingResponse
+from pagination import Page, decode_cursor, make_page
+from schemas.organization import (
+    CLUSTER_TOP_ACTIVITIES,
+    ClusterRequest,
+    FullTextSearchRequest,
+    OrganizationClusterResponse,
+    OrganizationFilter,
+    OrganizationResponse,
+    OrganizationDistanceResponse,
+    NearestSearchRequest,
+    RadiusSearchRequest,
+    RectangleSearchRequest,
+    SuggestRequest,
+    OrganizationSuggestion,
+)
 
 
 class OrganizationService:
+    # Одинаковые одновременные чтения выполняются один раз (None - без схлопывания)
+    single_flight: SingleFlight | None = single_flight
 
     def __init__(
             self,
@@ -21,41 +40,97 @@ class OrganizationService:
         self.activity_repository = activity_repository
         self.uow = uow
 
+    @coalesced
     async def get_organizations(
             self,
             filters: OrganizationFilter,
             include_subactivities=False,
             limit: int = 50,
-            offset: int = 0
-    ) -> List[Organization]:
+            offset: int = 0,
+            cursor: str | None = None,
+            name_match: str = "contains",
+            activity_depth: int = 0,
+    ) -> Page[OrganizationResponse]:
+        tree = await self.activity_repository.get_tree(self.uow.session)
+
+        # поиск по похожести названия: порядок по релевантности, курсор по (similarity, id)
+        if name_match == "similar" and filters.name:
+            rows = await self.repository.search_by_name(
+                self.uow.session,
+                filters.name,
+                filters.model_dump(exclude_none=True, exclude={"name"}),
+                limit + 1,
+                after=decode_cursor(cursor, "similarity"),
+                include_descendants=include_subactivities,
+            )
+            tree = await self._tree_covering(tree, rows)
+            return make_page(
+                rows, limit, "similarity",
+                key=lambda row: (row.similarity, row.id),
+                to_item=lambda row: self._to_response(row, tree, activity_depth=activity_depth),
+            )
+
+        after = decode_cursor(cursor, "id")
 
         # обычный поиск
         if not include_subactivities or filters.activity_id is None:
-            return await self.repository.find_all(
+            organizations = await self.repository.find_all(
                 self.uow.session,
                 filters.model_dump(exclude_none=True),
-                limit,
-                offset
+                limit + 1,
+                offset,
+                after=after,
+            )
+        else:
+            # Поиск со связями: поддерево раскрывается через activity_closure в том же запросе
+            organizations = await self.repository.find_by_activity_ids(
+                self.uow.session,
+                [filters.activity_id],
+                limit + 1,
+                offset,
+                include_descendants=True,
+                after=after,
             )
 
-        # Поиск со связями
-        activity_id = filters.activity_id
-        activity_ids = await self.activity_repository.get_activity_subtree_ids(
-            self.uow.session,
-            activity_id,
+        tree = await self._tree_covering(tree, organizations)
+        return make_page(
+            organizations, limit, "id",
+            key=lambda row: (row.id,),
+            to_item=lambda row: self._to_response(row, tree, activity_depth=activity_depth),
         )
-        return await self.repository.find_by_activity_ids(
+
+    @coalesced
+    async def search_organizations(self, params: FullTextSearchRequest) -> Page[OrganizationResponse]:
+        tree = await self.activity_repository.get_tree(self.uow.session)
+        rows = await self.repository.search_full_text(
             self.uow.session,
-            activity_ids,
-            limit,
-            offset
+            params.q,
+            params.limit + 1,
+            after=decode_cursor(params.cursor, "rank"),
         )
+        tree = await self._tree_covering(tree, rows)
+        return make_page(
+            rows, params.limit, "rank",
+            key=lambda row: (row.rank, row.id),
+            to_item=lambda row: self._to_response(row, tree, activity_depth=params.activity_depth),
+        )
+
+    async def suggest_organizations(self, params: SuggestRequest) -> List[OrganizationSuggestion]:
+        index = await self.repository.get_name_index(self.uow.session)
+        return [
+            OrganizationSuggestion(id=organization_id, name=name)
+            for organization_id, name in index.suggest(params.q, params.limit)
+        ]
 
-    async def get_organization(self, organization_id: int) -> Organization:
+    @coalesced
+    async def get_organization(self, organization_id: int, activity_depth: int = 0) -> OrganizationResponse:
+        tree = await self.activity_repository.get_tree(self.uow.session)
         try:
-            return await self.repository.get_by_id(self.uow.session, organization_id)
+            organization = await self.repository.get_by_id(self.uow.session, organization_id)
         except ModelNoFoundException:
             raise OrganizationNoFoundException
+        tree = await self._tree_covering(tree, [organization])
+        return self._to_response(organization, tree, activity_depth=activity_depth)
 
 
 
@@ -67,8 +142,11 @@ class OrganizationService:
                 self.uow.session,
                 organization_data
             )
+            version = await self.repository.name_index.written_version(self.uow.session)
 
-            return org
+        # Своя запись видна в подсказках сразу, не дожидаясь смены версии таблицы
+        self.repository.name_index.put(org.id, org.name, version)
+        return org
 
     async def update_organization(self, organization_data: dict) -> Organization:
         async with self.uow:
@@ -76,27 +154,156 @@ class OrganizationService:
                 self.uow.session,
                 organization_data
             )
-            return org
+            version = await self.repository.name_index.written_version(self.uow.session)
 
+        self.repository.name_index.put(org.id, org.name, version)
+        return org
+
+    @coalesced
     async def get_organizations_within_radius(
         self,
         coordinates: RadiusSearchRequest
-    ):
-        return await self.repository.find_within_radius(
+    ) -> Page[OrganizationDistanceResponse]:
+        tree = await self.activity_repository.get_tree(self.uow.session)
+        rows = await self.repository.find_within_radius(
             self.uow.session,
             coordinates.latitude,
             coordinates.longitude,
             coordinates.radius_km,
+            limit=coordinates.limit + 1,
+            order_by=coordinates.order_by,
+            after=decode_cursor(coordinates.cursor, coordinates.order_by),
         )
+        tree = await self._tree_covering(tree, rows)
+        return self._distance_page(rows, coordinates.limit, coordinates.order_by, tree, coordinates.activity_depth)
 
+    @coalesced
     async def get_organizations_within_rectangle(
         self,
         rectangle: RectangleSearchRequest
-    ):
-        return await self.repository.find_within_rectangle(
+    ) -> Page[OrganizationDistanceResponse]:
+        tree = await self.activity_repository.get_tree(self.uow.session)
+        rows = await self.repository.find_within_rectangle(
             self.uow.session,
             rectangle.min_lat,
             rectangle.max_lat,
             rectangle.min_lon,
             rectangle.max_lon,
+            limit=rectangle.limit + 1,
+            order_by=rectangle.order_by,
+            after=decode_cursor(rectangle.cursor, rectangle.order_by),
+        )
+        tree = await self._tree_covering(tree, rows)
+        return self._distance_page(rows, rectangle.limit, rectangle.order_by, tree, rectangle.activity_depth)
+
+    @coalesced
+    async def get_nearest_organizations(
+        self,
+        params: NearestSearchRequest
+    ) -> List[OrganizationDistanceResponse]:
+        tree = await self.activity_repository.get_tree(self.uow.session)
+        rows = await self.repository.find_nearest(
+            self.uow.session,
+            params.latitude,
+            params.longitude,
+            params.k,
+        )
+        tree = await self._tree_covering(tree, rows)
+        return [
+            self._to_response(
+                row, tree, OrganizationDistanceResponse,
+                activity_depth=params.activity_depth, distance_km=row.distance_km,
+            )
+            for row in rows
+        ]
+
+    @coalesced
+    async def get_organization_clusters(
+        self,
+        params: ClusterRequest
+    ) -> List[OrganizationClusterResponse]:
+        cell_lat, cell_lon, origin_lat, origin_lon = params.cell_size()
+        rows = await self.repository.cluster_within_rectangle(
+            self.uow.session,
+            params.min_lat,
+            params.max_lat,
+            params.min_lon,
+            params.max_lon,
+            cell_lat,
+            cell_lon,
+            origin_lat,
+            origin_lon,
+            top_activities=CLUSTER_TOP_ACTIVITIES,
+        )
+        return [
+            OrganizationClusterResponse(
+                latitude=row.latitude,
+                longitude=row.longitude,
+                count=row.count,
+                activity_ids=row.activity_ids,
+            )
+            for row in rows
+        ]
+
+    def _distance_page(
+            self,
+            rows: list,
+            limit: int,
+            order_by: str,
+            tree: ActivityTree,
+            activity_depth: int = 0,
+    ) -> Page[OrganizationDistanceResponse]:
+        """Строки чтения с distance_km -> страница с курсором продолжения"""
+        return make_page(
+            rows,
+            limit,
+            order_by,
+            key=lambda row: (row.distance_km, row.id) if order_by == "distance" else (row.id,),
+            to_item=lambda row: self._to_response(
+                row, tree, OrganizationDistanceResponse,
+                activity_depth=activity_depth, distance_km=row.distance_km,
+            ),
+        )
+
+    async def _tree_covering(self, tree: ActivityTree, rows) -> ActivityTree:
+        """
+        Строки из БД могут ссылаться на деятельности, которых ещё нет в дереве в памяти
+        (до истечения ttl или уведомления об изменении): тогда дерево перечитывается один раз
+        """
+        if any(activity_id not in tree.nodes for row in rows for activity_id in row.activity_ids or ()):
+            tree.invalidate()
+            tree = await self.activity_repository.get_tree(self.uow.session)
+        return tree
+
+    @staticmethod
+    def _to_response(
+            row,
+            tree: ActivityTree,
+            response_class: type[OrganizationResponse] = OrganizationResponse,
+            activity_depth: int = 0,
+            **extra,
+    ) -> OrganizationResponse:
+        """
+        Собирает ответ из строки чтения репозитория (см. OrganizationRepository._read_stmt),
+        деятельности берутся из дерева в памяти с дочерними до activity_depth уровней.
+        Данные из БД уже проверены схемой таблиц, поэтому модели собираются без повторной валидации
+        """
+        return response_class.model_construct(
+            id=row.id,
+            name=row.name,
+            building_id=row.building_id,
+            phone_numbers=row.phone_numbers,
+            building=BuildingResponse.model_construct(
+                id=row.building_id,
+                address=row.address,
+                latitude=row.latitude,
+                longitude=row.longitude,
+            ),
+            # Деятельность, которой нет и в перечитанном дереве (удалена между запросами), пропускаем
+            activities=[
+                tree.render(activity_id, activity_depth)
+                for activity_id in row.activity_ids or ()
+                if activity_id in tree.nodes
+            ],
+            **extra,
         )
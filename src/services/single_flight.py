@@ -0,0 +1,70 @@
+"""
+Схлопывание одинаковых одновременных чтений: пока запрос с теми же аргументами выполняется,
+остальные ждут его результат, а не идут в БД сами
+"""
+import asyncio
+import copy
+import functools
+import inspect
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from cache.query_cache import QueryCache
+from db.database import async_session_maker
+from services.unit_of_work import UnitOfWork
+
+
+class SingleFlight:
+    """
+    Общее чтение идёт в собственной сессии из session_maker, а не в сессии запроса-инициатора:
+    её закрывает teardown зависимости get_db_session, когда клиент инициатора отключается
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession] = async_session_maker):
+        self.session_maker = session_maker
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]):
+        """
+        Результат (или исключение) одного выполнения call на всех, кто пришёл с key,
+        пока оно идёт. Выполнение - отдельной задачей: отмена запроса-инициатора
+        (клиент отключился) не обрывает его для остальных
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+def coalesced(method):
+    """Чтение сервиса через self.single_flight; ключ - метод и нормализованные аргументы"""
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.single_flight is None:
+            return await method(self, *args, **kwargs)
+
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        params = {name: value for name, value in bound.arguments.items() if name != "self"}
+        flight = self.single_flight
+
+        async def shared_read():
+            async with flight.session_maker() as session:
+                service = copy.copy(self)
+                service.uow = UnitOfWork(session)
+                return await method(service, *args, **kwargs)
+
+        return await flight.do(QueryCache.make_key(method.__qualname__, params), shared_read)
+
+    return wrapper
+
+
+single_flight = SingleFlight()
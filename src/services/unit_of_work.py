@@ -1,6 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache.invalidation import publish_invalidation
+from cache.query_cache import SESSION_TAGS_KEY, QueryCache, query_cache
+from config import settings
+
+
 class UnitOfWork:
+    cache: QueryCache = query_cache
+
     def __init__(self, session: AsyncSession):
         self.session = session
 
@@ -14,7 +21,14 @@ class UnitOfWork:
             await self._commit()
 
     async def _commit(self):
+        tags = self.session.info.pop(SESSION_TAGS_KEY, set())
+        if tags:
+            # NOTIFY уйдёт другим воркерам вместе с commit, при откате - не уйдёт
+            await publish_invalidation(self.session, settings.cache_invalidation_channel, tags)
         await self.session.commit()
+        # Сбрасываем кэш чтений только после commit: до него другие сессии видят старые данные
+        await self.cache.invalidate(tags)
 
     async def _rollback(self):
         await self.session.rollback()
+        self.session.info.pop(SESSION_TAGS_KEY, None)
@@ -13,6 +13,8 @@ from services.organization import OrganizationService
 from repositories.organization import OrganizationRepository
 from repositories.activity import ActivityRepository
 from services import unit_of_work
+from cache.query_cache import query_cache
+from db.database import get_db_session
 from depends import (
     get_organization_service,
     get_uow,
@@ -61,9 +63,26 @@ def mock_org_service(mock_org_repository, mock_activity_repository, mock_uow):
     return service
 
 
+# Фикстура для мока сессии: её читает только ConditionalGet (версии таблиц для ETag)
+@pytest.fixture
+def mock_db_session():
+    result = MagicMock()
+    result.all.return_value = [("activities", 1), ("buildings", 1), ("organizations", 1)]
+    session = AsyncMock(spec=AsyncSession)
+    session.execute.return_value = result
+    return session
+
+
+# Схлопывание чтений открывает свою сессию из async_session_maker:
+# в тестах сервиса его нет, test_single_flight включает его явно
+@pytest.fixture(autouse=True)
+def no_single_flight(monkeypatch):
+    monkeypatch.setattr(OrganizationService, "single_flight", None)
+
+
 # Фикстура для подмены зависимостей
 @pytest.fixture(autouse=True)
-async def override_dependencies(mock_org_service):
+async def override_dependencies(mock_org_service, mock_db_session):
     """Автоматически подменяем зависимости для всех тестов"""
 
     # Подменяем get_organization_service
@@ -82,6 +101,10 @@ async def override_dependencies(mock_org_service):
     async def override_get_activity_repository():
         return mock_org_service.activity_repository
 
+    # Подменяем get_db_session, чтобы тесты не ходили в БД
+    async def override_get_db_session():
+        return mock_db_session
+
     # Подменяем verify_api_key для пропуска аутентификации в тестах
     async def override_verify_api_key():
         return True
@@ -91,6 +114,7 @@ async def override_dependencies(mock_org_service):
     app.dependency_overrides[get_organization_repository] = override_get_organization_repository
     app.dependency_overrides[get_activity_repository] = override_get_activity_repository
     app.dependency_overrides[verify_api_key] = override_verify_api_key
+    app.dependency_overrides[get_db_session] = override_get_db_session
 
     yield
 
@@ -114,4 +138,5 @@ async def client():
 async def cleanup():
     """Очистка между тестами"""
     yield
+    await query_cache.clear()  # Закэшированные чтения одного теста не видны другим
     await asyncio.sleep(0.001)  # Небольшая пауза для завершения операций
@@ -0,0 +1,280 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from cache.activity_tree import ActivityTree, ActivityNode
+from db.models import Activity
+from exceptions import ActivityValidationError
+from pagination import decode_cursor, encode_cursor
+from repositories.activity import ActivityRepository
+from repositories.organization import OrganizationRepository
+from services.organization import OrganizationService
+from schemas.organization import OrganizationFilter
+
+
+NODES = [
+    ActivityNode(id=1, name="Еда", level=1, parent_id=None),
+    ActivityNode(id=2, name="Автомобили", level=1, parent_id=None),
+    ActivityNode(id=3, name="Мясная продукция", level=2, parent_id=1),
+    ActivityNode(id=4, name="Молочная продукция", level=2, parent_id=1),
+    ActivityNode(id=5, name="Легковые", level=2, parent_id=2),
+    ActivityNode(id=6, name="Запчасти", level=3, parent_id=5),
+]
+
+
+def make_result(rows=(), scalar=None):
+    result = MagicMock()
+    result.all.return_value = list(rows)
+    result.scalar_one_or_none.return_value = scalar
+    result.scalars.return_value.all.return_value = []
+    return result
+
+
+def make_tree(ttl=60.0) -> ActivityTree:
+    tree = ActivityTree(ttl=ttl)
+    tree.build(NODES, version=1)
+    tree._stale = False
+    tree._checked_at = float("inf")
+    return tree
+
+
+def test_tree_maps():
+    tree = make_tree()
+
+    assert tree.children[1] == (3, 4)
+    assert tree.parent[6] == 5
+    assert tree.ancestors[6] == (5, 2)
+    assert tree.descendants[2] == (5, 6)
+    assert tree.subtree_ids([2, 5]) == [2, 5, 6]
+
+
+def test_tree_render_depth():
+    tree = make_tree()
+
+    rendered = tree.render(2, depth=1)
+    assert [child.id for child in rendered.children] == [5]
+    assert rendered.children[0].children is None
+    assert tree.render(2, depth=2).children[0].children[0].name == "Запчасти"
+
+
+@pytest.mark.asyncio
+async def test_tree_reloads_only_on_version_change():
+    tree = ActivityTree(ttl=0)
+    session = AsyncMock()
+    rows = [(n.id, n.name, n.level, n.parent_id) for n in NODES]
+    session.execute.side_effect = [
+        make_result(scalar=1), make_result(rows),   # первая загрузка
+        make_result(scalar=1),                      # версия не изменилась
+        make_result(scalar=2), make_result(rows[:2]),  # новая версия
+    ]
+
+    await tree.ensure_fresh(session)
+    assert len(tree.nodes) == 6
+    await tree.ensure_fresh(session)
+    assert session.execute.await_count == 3
+    await tree.ensure_fresh(session)
+    assert len(tree.nodes) == 2
+    assert tree.version == 2
+
+
+@pytest.mark.asyncio
+async def test_tree_ttl_skips_version_check():
+    tree = make_tree()
+    tree._checked_at = 0
+    tree.ttl = float("inf")
+    session = AsyncMock()
+
+    await tree.ensure_fresh(session)
+
+    session.execute.assert_not_awaited()
+
+
+@pytest.mark.parametrize("tree_size", [1, 10, 1000])
+@pytest.mark.asyncio
+async def test_include_subactivities_without_tree_queries(tree_size):
+    tree = ActivityTree(ttl=60.0)
+    tree.build(
+        [ActivityNode(id=1, name="root", level=1, parent_id=None)]
+        + [ActivityNode(id=i, name=str(i), level=2, parent_id=1) for i in range(2, tree_size + 1)],
+        version=1,
+    )
+    tree._stale = False
+    tree._checked_at = float("inf")
+    activity_repository = ActivityRepository()
+    activity_repository.tree = tree
+
+    session = AsyncMock()
+    session.execute.return_value = make_result()
+    repository = OrganizationRepository()
+    service = OrganizationService(
+        repository=repository,
+        activity_repository=activity_repository,
+        uow=MagicMock(session=session),
+    )
+
+    await service.get_organizations(
+        OrganizationFilter(activity_id=1),
+        include_subactivities=True,
+    )
+
+    assert session.execute.await_count == 1
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "EXISTS (SELECT organization_activity.organization_id" in sql
+    assert "JOIN activity_closure" in sql
+    assert "RECURSIVE" not in sql
+
+
+@pytest.mark.asyncio
+async def test_find_all_keyset_after_last_id():
+    repository = ActivityRepository()
+    repository.tree = make_tree()
+    session = AsyncMock()
+
+    first = await repository.find_all(session, limit=2)
+    second = await repository.find_all(session, limit=2, after=(first[-1].id,))
+
+    assert [a.id for a in first] == [1, 2]
+    assert [a.id for a in second] == [3, 4]
+    session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_keyset_cursor():
+    activity_repository = ActivityRepository()
+    activity_repository.tree = make_tree()
+    session = AsyncMock()
+    session.execute.return_value = make_result()
+    service = OrganizationService(
+        repository=OrganizationRepository(),
+        activity_repository=activity_repository,
+        uow=MagicMock(session=session),
+    )
+
+    page = await service.get_organizations(
+        OrganizationFilter(), limit=10, cursor=encode_cursor("id", [42]),
+    )
+
+    stmt = session.execute.await_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    params = stmt.compile().params
+    assert "organizations.id > " in sql
+    assert "ORDER BY organizations.id" in sql
+    assert 42 in params.values() and 11 in params.values()
+    assert page.items == [] and page.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_similar_name_page():
+    activity_repository = ActivityRepository()
+    activity_repository.tree = make_tree()
+    repository = AsyncMock(spec=OrganizationRepository)
+    repository.search_by_name.return_value = [
+        MagicMock(id=9, similarity=0.8),
+        MagicMock(id=3, similarity=0.7),
+    ]
+    service = OrganizationService(
+        repository=repository,
+        activity_repository=activity_repository,
+        uow=MagicMock(session=AsyncMock()),
+    )
+    service._to_response = MagicMock(side_effect=lambda row, tree, **kwargs: row.id)
+
+    page = await service.get_organizations(
+        OrganizationFilter(name="Рога", activity_id=1),
+        include_subactivities=True,
+        limit=1,
+        name_match="similar",
+    )
+
+    assert page.items == [9]
+    assert decode_cursor(page.next_cursor, "similarity") == (0.8, 9)
+    args = repository.search_by_name.await_args
+    assert args.args[1:3] == ("Рога", {"activity_id": 1})
+    assert args.kwargs["include_descendants"] is True
+    repository.find_all.assert_not_awaited()
+
+
+def test_validate_parent_uses_tree_lookup(monkeypatch):
+    import cache.activity_tree
+
+    monkeypatch.setattr(cache.activity_tree, "activity_tree", make_tree())
+
+    assert Activity(name="Шины", level=3, parent_id=5).parent_id == 5
+    with pytest.raises(ActivityValidationError):
+        Activity(name="Летние", parent_id=6)
+
+
+def test_to_response_from_read_row():
+    from collections import namedtuple
+
+    Row = namedtuple("Row", "id name building_id phone_numbers address latitude longitude activity_ids")
+    row = Row(7, "Рога и копыта", 3, ["2-222-222"], "ул. Блюхера, 32/1", 55.0, 37.0, [1, 6])
+
+    response = OrganizationService._to_response(row, make_tree(), activity_depth=1)
+
+    assert response.model_dump() == {
+        "id": 7,
+        "name": "Рога и копыта",
+        "building_id": 3,
+        "phone_numbers": ["2-222-222"],
+        "building": {"id": 3, "address": "ул. Блюхера, 32/1", "latitude": 55.0, "longitude": 37.0},
+        "activities": [
+            {
+                "id": 1, "name": "Еда", "parent_id": None, "level": 1,
+                "children": [
+                    {"id": 3, "name": "Мясная продукция", "parent_id": 1, "level": 2, "children": None},
+                    {"id": 4, "name": "Молочная продукция", "parent_id": 1, "level": 2, "children": None},
+                ],
+            },
+            {"id": 6, "name": "Запчасти", "parent_id": 5, "level": 3, "children": []},
+        ],
+    }
+    assert OrganizationService._to_response(row._replace(activity_ids=None), make_tree()).activities == []
+
+
+@pytest.mark.parametrize("activity_depth, children", [(0, None), (1, [3, 4]), (2, [3, 4])])
+def test_to_response_activity_depth(activity_depth, children):
+    from collections import namedtuple
+
+    Row = namedtuple("Row", "id name building_id phone_numbers address latitude longitude activity_ids")
+    row = Row(7, "Авто", 3, [], "ул. Ленина, 1", 55.0, 37.0, [1])
+
+    activity = OrganizationService._to_response(row, make_tree(), activity_depth=activity_depth).activities[0]
+
+    assert (None if activity.children is None else [child.id for child in activity.children]) == children
+    if activity_depth == 2:
+        assert all(child.children == [] for child in activity.children)
+
+
+@pytest.mark.asyncio
+async def test_row_with_activity_missing_from_tree():
+    from collections import namedtuple
+
+    # В памяти дерево без «Запчастей»: в БД деятельность уже есть, ttl ещё не истёк
+    activity_repository = ActivityRepository()
+    activity_repository.tree = ActivityTree(ttl=float("inf"))
+    activity_repository.tree.build(NODES[:5], version=1)
+    activity_repository.tree._stale = False
+    activity_repository.tree._checked_at = float("inf")
+    session = AsyncMock()
+    session.execute.side_effect = [
+        make_result(scalar=2),
+        make_result([(n.id, n.name, n.level, n.parent_id) for n in NODES]),
+    ]
+    Row = namedtuple("Row", "id name building_id phone_numbers address latitude longitude activity_ids")
+    repository = AsyncMock()
+    # 99 нет и после перечитывания (удалена между запросами)
+    repository.get_by_id.return_value = Row(7, "Рога и копыта", 3, [], "Адрес", 55.0, 37.0, [1, 6, 99])
+    service = OrganizationService(
+        repository=repository,
+        activity_repository=activity_repository,
+        uow=MagicMock(session=session),
+    )
+
+    response = await service.get_organization(7)
+
+    assert [activity.id for activity in response.activities] == [1, 6]
+    assert activity_repository.tree.version == 2
+    assert session.execute.await_count == 2
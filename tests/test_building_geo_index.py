@@ -0,0 +1,61 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from cache.building_geo_index import BuildingGeoIndex
+from geo import haversine_km
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(7)
+    size = 20_000
+    geo_index = BuildingGeoIndex(ttl=60.0)
+    geo_index.build(
+        np.arange(1, size + 1, dtype=np.int64),
+        rng.uniform(50, 60, size),
+        np.concatenate([rng.uniform(30, 40, size - 100), rng.uniform(179.5, 180, 100)]),
+        version=1,
+    )
+    return geo_index
+
+
+def brute_force_radius(index, latitude, longitude, radius_km):
+    return {
+        int(building_id)
+        for building_id, lat, lon in zip(index.ids, index.latitudes, index.longitudes)
+        if haversine_km(latitude, longitude, lat, lon) <= radius_km
+    }
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_km", [(55.0, 35.0, 25), (55.0, -179.9, 60), (50.0, 30.0, 5)])
+def test_within_radius_matches_brute_force(index, latitude, longitude, radius_km):
+    building_ids, distances = index.within_radius(latitude, longitude, radius_km)
+
+    assert set(building_ids.tolist()) == brute_force_radius(index, latitude, longitude, radius_km)
+    assert (distances <= radius_km).all()
+
+
+def test_within_rectangle(index):
+    building_ids, distances = index.within_rectangle(54.0, 55.0, 33.0, 34.0, 54.5, 33.5)
+
+    expected = {
+        int(building_id)
+        for building_id, lat, lon in zip(index.ids, index.latitudes, index.longitudes)
+        if 54.0 <= lat <= 55.0 and 33.0 <= lon <= 34.0
+    }
+    assert set(building_ids.tolist()) == expected
+    assert distances.max() <= haversine_km(54.5, 33.5, 54.0, 33.0)
+
+
+def test_nearest(index):
+    building_ids, distances = index.nearest(55.0, 35.0, 5)
+
+    all_distances = sorted(
+        haversine_km(55.0, 35.0, lat, lon) for lat, lon in zip(index.latitudes, index.longitudes)
+    )
+    assert len(building_ids) == 5
+    assert distances.tolist() == pytest.approx(all_distances[:5])
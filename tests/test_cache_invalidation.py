@@ -0,0 +1,135 @@
+import sys
+sys.path.append("src/")
+
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from sqlalchemy.dialects import postgresql
+from cache.invalidation import MAX_PAYLOAD_BYTES, InvalidationListener, notification_payloads
+from cache.query_cache import SESSION_TAGS_KEY, MemoryBackend, QueryCache, RedisBackend
+from cache.versioned import VersionedCache
+from services.unit_of_work import UnitOfWork
+
+
+def make_cache(table_name: str) -> VersionedCache:
+    cache = VersionedCache(ttl=3600)
+    cache.table_name = table_name
+    cache._stale = False
+    return cache
+
+
+def make_listener(query_cache: QueryCache, *caches) -> InvalidationListener:
+    return InvalidationListener("postgresql://test", "cache_invalidation", query_cache, caches)
+
+
+def test_payloads_fit_notify_limit():
+    tags = {f"organizations:{organization_id}" for organization_id in range(2000)}
+
+    payloads = notification_payloads(tags)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= MAX_PAYLOAD_BYTES for payload in payloads)
+    assert {tag for payload in payloads for tag in json.loads(payload)} == tags
+
+
+@pytest.mark.asyncio
+async def test_commit_publishes_tags_in_transaction():
+    session = AsyncMock()
+    session.info = {SESSION_TAGS_KEY: {"buildings", "buildings:5"}}
+    calls = []
+    session.execute.side_effect = lambda stmt: calls.append("notify")
+    session.commit.side_effect = lambda: calls.append("commit")
+    uow = UnitOfWork(session)
+    uow.cache = QueryCache(None)
+
+    async with uow:
+        pass
+
+    assert calls == ["notify", "commit"]
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "pg_notify" in sql
+
+
+@pytest.mark.asyncio
+async def test_commit_without_writes_does_not_notify():
+    session = AsyncMock()
+    session.info = {}
+
+    async with UnitOfWork(session):
+        pass
+
+    session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_notification_evicts_affected_caches():
+    query_cache = QueryCache(MemoryBackend(maxsize=10, ttl=3600))
+    await query_cache.get_or_load("ns", {"id": 1}, {"buildings:5"}, AsyncMock(return_value=1))
+    await query_cache.get_or_load("ns", {"id": 2}, {"buildings:6"}, AsyncMock(return_value=2))
+    tree, geo_index = make_cache("activities"), make_cache("buildings")
+    listener = make_listener(query_cache, tree, geo_index)
+
+    await listener.apply(["buildings", "buildings:5"])
+
+    assert geo_index._stale and not tree._stale
+    assert len(query_cache.backend) == 1
+
+
+@pytest.mark.asyncio
+async def test_shared_query_cache_not_cleared_on_reconnect():
+    client = AsyncMock()
+    client.smembers.return_value = set()
+    query_cache = QueryCache(RedisBackend(client, ttl=60))
+    listener = make_listener(query_cache, make_cache("organizations"))
+
+    await listener.apply(["organizations"])
+    client.delete.assert_awaited_once_with("query-cache:tag:organizations")
+
+    client.reset_mock()
+    await listener.invalidate_all()
+    assert not client.mock_calls
+    assert listener.caches[0]._stale
+
+
+@pytest.mark.asyncio
+async def test_on_notification_parses_payload():
+    listener = make_listener(QueryCache(None), make_cache("activities"))
+
+    listener._on_notification(SimpleNamespace(), 1, "cache_invalidation", '["activities", "activities:3"]')
+    for task in list(listener._pending):
+        await task
+
+    assert listener.caches[0]._stale
+
+
+@pytest.mark.parametrize("payload", ["not json", '{"tags": ["activities"]}', "[1, 2]", '"activities"'])
+@pytest.mark.asyncio
+async def test_bad_payload_invalidates_all(payload):
+    query_cache = QueryCache(MemoryBackend(maxsize=10, ttl=3600))
+    await query_cache.get_or_load("ns", {"id": 1}, {"buildings:5"}, AsyncMock(return_value=1))
+    listener = make_listener(query_cache, make_cache("activities"), make_cache("buildings"))
+
+    listener._on_notification(SimpleNamespace(), 1, "cache_invalidation", payload)
+    for task in list(listener._pending):
+        await task
+
+    assert all(cache._stale for cache in listener.caches)
+    assert len(query_cache.backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_catch_up_resets_only_changed_tables():
+    query_cache = QueryCache(MemoryBackend(maxsize=10, ttl=3600))
+    listener = make_listener(query_cache, make_cache("activities"), make_cache("buildings"))
+    await listener.catch_up({"activities": 1, "buildings": 1})
+    for cache in listener.caches:
+        cache._stale = False
+    await query_cache.get_or_load("ns", {"id": 1}, {"buildings"}, AsyncMock(return_value=1))
+    await query_cache.get_or_load("ns", {"id": 2}, {"activities"}, AsyncMock(return_value=2))
+
+    await listener.catch_up({"activities": 1, "buildings": 2})
+
+    activities, buildings = listener.caches
+    assert buildings._stale and not activities._stale
+    assert len(query_cache.backend) == 1
@@ -0,0 +1,96 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+from httpx import AsyncClient
+from conditional import etag_matches
+from config import settings
+from pagination import Page
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches('"b"', 'W/"b"')
+    assert etag_matches('W/"b"', 'W/"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+@pytest.mark.asyncio
+async def test_get_returns_etag_and_cache_control(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    response = await client.get("/api/v1/organizations?building_id=2&limit=10")
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == settings.cache_control_organizations
+    assert response.headers["cache-control"].startswith("private")
+    assert response.headers["vary"] == "Authorization"
+
+    # Порядок параметров на ETag не влияет, другие параметры - влияют
+    same = await client.get("/api/v1/organizations?limit=10&building_id=2")
+    other = await client.get("/api/v1/organizations?building_id=3&limit=10")
+    assert same.headers["etag"] == response.headers["etag"]
+    assert other.headers["etag"] != response.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_if_none_match_skips_query(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+    etag = (await client.get("/api/v1/organizations?building_id=2")).headers["etag"]
+    mock_org_service.get_organizations.reset_mock()
+
+    response = await client.get("/api/v1/organizations?building_id=2", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Authorization"
+    assert response.content == b""
+    mock_org_service.get_organizations.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_version_change_invalidates_etag(client: AsyncClient, mock_org_service, mock_db_session):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+    etag = (await client.get("/api/v1/organizations?building_id=2")).headers["etag"]
+
+    mock_db_session.execute.return_value.all.return_value = [("buildings", 2), ("organizations", 1)]
+    response = await client.get("/api/v1/organizations?building_id=2", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    mock_org_service.get_organizations.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_suggest_skips_version_check(client: AsyncClient, mock_org_service, mock_db_session):
+    mock_org_service.suggest_organizations.return_value = []
+
+    response = await client.get("/api/v1/organizations/suggest?q=ро")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    mock_db_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_caches_behind_versions_reset_before_response(
+        client: AsyncClient, mock_org_service, mock_db_session, monkeypatch,
+):
+    from cache.activity_tree import activity_tree
+    from cache.invalidation import invalidation_listener
+
+    monkeypatch.setattr(invalidation_listener, "_seen_versions", {"activities": 1, "buildings": 1, "organizations": 1})
+    monkeypatch.setattr(activity_tree, "_stale", False)
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    await client.get("/api/v1/organizations?building_id=2")
+    assert not activity_tree._stale
+
+    # Запись в activities, уведомление о которой ещё не пришло
+    mock_db_session.execute.return_value.all.return_value = [("activities", 2), ("buildings", 1), ("organizations", 1)]
+    await client.get("/api/v1/organizations?building_id=2")
+    assert activity_tree._stale
@@ -0,0 +1,75 @@
+import sys
+sys.path.append("src/")
+
+import math
+import random
+import pytest
+from geo import haversine_km, bounding_boxes, geohash_encode, geohash_ranges
+
+
+def test_haversine_known_distance():
+    # Москва - Санкт-Петербург, ~634 км
+    assert haversine_km(55.7558, 37.6173, 59.9343, 30.3351) == pytest.approx(634, abs=2)
+
+
+def test_haversine_same_point_is_zero():
+    # acos(...) на таких входах даёт NaN из-за округления
+    assert haversine_km(55.7558, 37.6173, 55.7558, 37.6173) == 0
+    assert not math.isnan(haversine_km(55.75580000001, 37.6173, 55.7558, 37.6173))
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, radius_km",
+    [(55.75, 37.62, 10), (-33.9, 18.4, 500), (64.0, 179.9, 50), (10.0, -179.95, 30)],
+)
+def test_bounding_boxes_cover_circle(latitude, longitude, radius_km):
+    boxes = bounding_boxes(latitude, longitude, radius_km)
+
+    for bearing in range(0, 360, 5):
+        # точка на границе круга
+        angular = radius_km / 6371.0 * 0.999
+        lat1, lon1, theta = map(math.radians, (latitude, longitude, bearing))
+        lat2 = math.asin(math.sin(lat1) * math.cos(angular) + math.cos(lat1) * math.sin(angular) * math.cos(theta))
+        lon2 = lon1 + math.atan2(
+            math.sin(theta) * math.sin(angular) * math.cos(lat1),
+            math.cos(angular) - math.sin(lat1) * math.sin(lat2),
+        )
+        point_lat = math.degrees(lat2)
+        point_lon = (math.degrees(lon2) + 540) % 360 - 180
+
+        assert any(
+            min_lat <= point_lat <= max_lat and min_lon <= point_lon <= max_lon
+            for min_lat, max_lat, min_lon, max_lon in boxes
+        )
+
+
+def test_bounding_boxes_split_on_antimeridian():
+    assert len(bounding_boxes(64.0, 179.9, 50)) == 2
+
+
+def test_bounding_boxes_over_pole():
+    assert bounding_boxes(89.9, 0, 50) == [(pytest.approx(89.45, abs=0.01), 90.0, -180.0, 180.0)]
+
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(55.7558, 37.6173).startswith("ucfv0")
+
+
+@pytest.mark.parametrize(
+    "box",
+    [(55.70, 55.80, 37.55, 37.70), (-10.0, 10.0, -5.0, 5.0), (-90.0, 90.0, -180.0, 180.0)],
+)
+def test_geohash_ranges_cover_box(box):
+    rng = random.Random(42)
+    ranges = geohash_ranges([box])
+    min_lat, max_lat, min_lon, max_lon = box
+
+    assert len(ranges) <= 32
+    for _ in range(500):
+        point = geohash_encode(rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+        assert any(start <= point < end for start, end in ranges)
+
+
+def test_geohash_ranges_merge_neighbours():
+    assert geohash_ranges([(-90.0, 90.0, -180.0, 180.0)]) == [("0", "z~")]
@@ -0,0 +1,119 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from cache.organization_names import OrganizationNameIndex, normalize_name
+
+
+def make_index(rows) -> OrganizationNameIndex:
+    index = OrganizationNameIndex(ttl=60.0)
+    index.build(rows, version=1)
+    index._stale = False
+    index._checked_at = float("inf")
+    return index
+
+
+ROWS = [
+    (1, "ООО «Рога и Копыта»"),
+    (2, "Рогатка"),
+    (3, "Молочный дом Ёлка"),
+    (4, "Копытце"),
+]
+
+
+def test_normalize_name():
+    assert normalize_name("  ООО «Рога-и-Копыта»!  ") == "ооо рога и копыта"
+    assert normalize_name("Ёлка") == "елка"
+
+
+def test_suggest_by_name_and_word_prefix():
+    index = make_index(ROWS)
+
+    assert index.suggest("ООО р", 10) == [(1, "ООО «Рога и Копыта»")]
+    assert sorted(index.suggest("рог", 10)) == [(1, "ООО «Рога и Копыта»"), (2, "Рогатка")]
+    assert sorted(index.suggest("КОПЫТ", 10)) == [(1, "ООО «Рога и Копыта»"), (4, "Копытце")]
+    assert index.suggest("ёлк", 10) == [(3, "Молочный дом Ёлка")]
+    assert index.suggest("мясо", 10) == []
+    assert index.suggest(" «» ", 10) == []
+
+
+def test_suggest_limit_counts_organizations():
+    index = make_index([(1, "Рога рога рога"), (2, "Рога"), (3, "Рога и копыта")])
+
+    found = index.suggest("рога", 2)
+
+    assert len(found) == 2
+    assert len({organization_id for organization_id, _ in found}) == 2
+
+
+def test_put_and_remove_incrementally():
+    index = make_index(ROWS)
+
+    index.put(5, "Рогач")
+    index.put(2, "Ватрушка")
+    index.remove(4)
+
+    assert sorted(index.suggest("рог", 10)) == [(1, "ООО «Рога и Копыта»"), (5, "Рогач")]
+    assert index.suggest("ватр", 10) == [(2, "Ватрушка")]
+    assert index.suggest("копытц", 10) == []
+    assert index.entries == sorted(index.entries)
+
+
+@pytest.mark.asyncio
+async def test_suggest_without_db_queries():
+    from repositories.organization import OrganizationRepository
+    from schemas.organization import SuggestRequest
+    from services.organization import OrganizationService
+
+    repository = OrganizationRepository()
+    repository.name_index = make_index(ROWS)
+    session = AsyncMock()
+    service = OrganizationService(
+        repository=repository,
+        activity_repository=MagicMock(),
+        uow=MagicMock(session=session),
+    )
+
+    suggestions = await service.suggest_organizations(SuggestRequest(q="рога и"))
+
+    assert [(s.id, s.name) for s in suggestions] == [(1, "ООО «Рога и Копыта»")]
+    session.execute.assert_not_awaited()
+
+
+def make_result(scalar=None, rows=()):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = scalar
+    result.all.return_value = list(rows)
+    return result
+
+
+@pytest.mark.asyncio
+async def test_own_write_does_not_reload_index():
+    index = make_index(ROWS)
+    session = AsyncMock()
+    session.execute.return_value = make_result(scalar=2)
+
+    index.put(5, "Рогач", await index.written_version(session))
+    # Уведомление о своей же записи: версия проверяется, таблица не перечитывается
+    index.invalidate()
+    await index.ensure_fresh(session)
+
+    assert index.version == 2
+    assert session.execute.await_count == 2
+    assert index.suggest("рогач", 10) == [(5, "Рогач")]
+
+
+@pytest.mark.asyncio
+async def test_missed_foreign_write_reloads_index():
+    index = make_index(ROWS)
+    session = AsyncMock()
+    # Между версией индекса и нашей записью была чужая (версия 2)
+    index.put(5, "Рогач", version=3)
+    index.invalidate()
+    session.execute.side_effect = [make_result(scalar=3), make_result(rows=ROWS + [(5, "Рогач"), (6, "Рогожа")])]
+
+    await index.ensure_fresh(session)
+
+    assert index.version == 3
+    assert sorted(index.suggest("рог", 10))[-1] == (6, "Рогожа")
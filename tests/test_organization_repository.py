@@ -0,0 +1,310 @@
+import sys
+sys.path.append("src/")
+
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from config import settings
+from db.database import resolve_geo_backend
+from exceptions import GeoBackendUnavailableError
+from geo import MAX_DISTANCE_KM
+from repositories.organization import OrganizationRepository
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def make_session(scalar):
+    result = MagicMock()
+    result.scalar_one.return_value = scalar
+    session = AsyncMock()
+    session.execute.return_value = result
+    return session
+
+
+@pytest.mark.parametrize(
+    "configured, postgis_available, expected",
+    [("auto", True, "postgis"), ("auto", False, "sql"), ("sql", True, "sql"), ("postgis", True, "postgis")],
+)
+@pytest.mark.asyncio
+async def test_resolve_geo_backend(configured, postgis_available, expected):
+    assert await resolve_geo_backend(make_session(postgis_available), configured) == expected
+
+
+@pytest.mark.asyncio
+async def test_resolve_geo_backend_postgis_missing():
+    with pytest.raises(GeoBackendUnavailableError):
+        await resolve_geo_backend(make_session(False), "postgis")
+
+
+@pytest.mark.parametrize(
+    "backend, fragment",
+    [("sql", "buildings.geohash >="), ("postgis", "ST_DWithin(buildings.location")],
+)
+def test_radius_condition_backend(monkeypatch, backend, fragment):
+    monkeypatch.setattr(settings, "geo_backend", backend)
+
+    sql = compile_sql(OrganizationRepository()._radius_condition(55.75, 37.62, 10))
+
+    assert fragment in sql
+
+
+@pytest.mark.parametrize(
+    "backend, fragment",
+    [("sql", "buildings.geohash >="), ("postgis", "geometry(buildings.location) && ST_MakeEnvelope")],
+)
+def test_rectangle_condition_backend(monkeypatch, backend, fragment):
+    monkeypatch.setattr(settings, "geo_backend", backend)
+
+    sql = compile_sql(OrganizationRepository()._rectangle_condition(55.0, 56.0, 37.0, 38.0))
+
+    assert fragment in sql
+
+
+@pytest.mark.skipif(
+    "TEST_POSTGIS_DSN" not in os.environ,
+    reason="нужен локальный Postgres с PostGIS и применёнными миграциями (TEST_POSTGIS_DSN)",
+)
+@pytest.mark.asyncio
+async def test_postgis_matches_sql_backend(monkeypatch):
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from db.models import Building, Organization
+
+    engine = create_async_engine(os.environ["TEST_POSTGIS_DSN"])
+    repository = OrganizationRepository()
+    try:
+        async with AsyncSession(engine) as session:
+            assert await resolve_geo_backend(session, "auto") == "postgis"
+
+            points = [(55.7558, 37.6173), (55.7510, 37.6200), (55.80, 37.70), (59.93, 30.33)]
+            for number, (latitude, longitude) in enumerate(points):
+                building_id = (await session.execute(
+                    insert(Building)
+                    .values(address=f"test postgis {number}", latitude=latitude, longitude=longitude)
+                    .returning(Building.id)
+                )).scalar_one()
+                await session.execute(
+                    insert(Organization).values(name=f"test postgis {number}", building_id=building_id, phone_numbers=[])
+                )
+
+            results = {}
+            for backend in ("sql", "postgis"):
+                monkeypatch.setattr(settings, "geo_backend", backend)
+                in_radius = await repository.find_within_radius(session, 55.7558, 37.6173, 10)
+                in_rectangle = await repository.find_within_rectangle(session, 55.7, 55.9, 37.5, 37.8)
+                results[backend] = (
+                    sorted(row.id for row in in_radius),
+                    sorted(row.id for row in in_rectangle),
+                )
+
+            assert results["postgis"] == results["sql"]
+            await session.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_numpy_engine_fetches_by_building_ids(monkeypatch):
+    np = pytest.importorskip("numpy")
+    from cache.building_geo_index import BuildingGeoIndex
+
+    index = BuildingGeoIndex(ttl=float("inf"))
+    index.build(np.array([1, 2, 3]), np.array([55.75, 55.76, 59.93]), np.array([37.61, 37.62, 30.33]), version=1)
+    index._stale = False
+    index._checked_at = float("inf")
+    repository = OrganizationRepository()
+    repository.geo_index = index
+    monkeypatch.setattr(settings, "geo_engine", "numpy")
+
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+    await repository.find_within_radius(session, 55.75, 37.61, 5)
+
+    stmt = session.execute.await_args.args[0]
+    assert session.execute.await_count == 1
+    assert sorted(stmt.compile().params["building_ids"]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_radius_page_keyset_by_distance(monkeypatch):
+    monkeypatch.setattr(settings, "geo_engine", "sql")
+    monkeypatch.setattr(settings, "geo_backend", "sql")
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().find_within_radius(
+        session, 55.75, 37.62, 10, limit=11, order_by="distance", after=(1.5, 7),
+    )
+
+    stmt = session.execute.await_args.args[0]
+    sql = compile_sql(stmt)
+    params = stmt.compile().params
+    assert "organizations.id) > (" in sql
+    assert sql.rstrip().endswith("organizations.id \n LIMIT %(param_4)s::INTEGER")
+    assert (params["param_2"], params["param_3"], params["param_4"]) == (1.5, 7, 11)
+
+
+@pytest.mark.asyncio
+async def test_nearest_expands_radius_until_k_found(monkeypatch):
+    monkeypatch.setattr(settings, "geo_engine", "sql")
+    monkeypatch.setattr(settings, "geo_backend", "sql")
+    repository = OrganizationRepository()
+    radii = []
+
+    async def find_within_radius(session, latitude, longitude, radius_km, limit, order_by):
+        radii.append(radius_km)
+        return ["row"] * (3 if radius_km >= 16 else 1)
+
+    monkeypatch.setattr(repository, "find_within_radius", find_within_radius)
+
+    rows = await repository.find_nearest(AsyncMock(), 55.75, 37.62, 3)
+
+    assert rows == ["row"] * 3
+    assert radii == [1.0, 4.0, 16.0]
+
+
+@pytest.mark.asyncio
+async def test_nearest_stops_at_max_distance(monkeypatch):
+    monkeypatch.setattr(settings, "geo_engine", "sql")
+    monkeypatch.setattr(settings, "geo_backend", "sql")
+    repository = OrganizationRepository()
+    radii = []
+
+    async def find_within_radius(session, latitude, longitude, radius_km, limit, order_by):
+        radii.append(radius_km)
+        return []
+
+    monkeypatch.setattr(repository, "find_within_radius", find_within_radius)
+
+    assert await repository.find_nearest(AsyncMock(), 55.75, 37.62, 3) == []
+    assert radii[-1] == MAX_DISTANCE_KM
+
+
+def test_cluster_cell_size():
+    from schemas.organization import ClusterRequest
+
+    by_zoom = ClusterRequest(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0, zoom=2)
+    by_grid = ClusterRequest(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=39.0, grid_size=4)
+
+    # сетка по zoom привязана к миру, по grid_size - к углу области
+    assert by_zoom.cell_size() == (22.5, 22.5, 0.0, 0.0)
+    assert by_grid.cell_size() == (0.25, 0.5, 55.0, 37.0)
+
+
+@pytest.mark.asyncio
+async def test_clusters_single_statement(monkeypatch):
+    monkeypatch.setattr(settings, "geo_backend", "sql")
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().cluster_within_rectangle(session, 55.0, 56.0, 37.0, 38.0, 0.1, 0.1)
+
+    sql = compile_sql(session.execute.await_args.args[0])
+    assert session.execute.await_count == 1
+    assert "GROUP BY points.cell_y, points.cell_x" in sql
+    assert "row_number() OVER (PARTITION BY points.cell_y, points.cell_x" in sql
+
+
+@pytest.mark.parametrize("filters", [{"activity_id": 3}, {"activity_id": 3, "building_id": 1}])
+@pytest.mark.asyncio
+async def test_activity_filter_is_semi_join(filters):
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().find_all(session, filters, limit=51)
+
+    sql = compile_sql(session.execute.await_args.args[0])
+    assert "FROM organizations JOIN buildings ON buildings.id = organizations.building_id \nWHERE" in sql
+    assert "EXISTS (SELECT organization_activity.organization_id" in sql
+    assert "organization_activity.organization_id = organizations.id" in sql
+
+
+@pytest.mark.asyncio
+async def test_search_by_name_ranked_by_similarity():
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().search_by_name(
+        session, "Рога и капыта", {"building_id": 1}, limit=11, after=(0.5, 7),
+    )
+
+    stmt = session.execute.await_args.args[0]
+    sql = compile_sql(stmt)
+    params = stmt.compile().params
+    assert "organizations.name %%> %(name_1)s" in sql
+    assert "ILIKE" not in sql
+    assert sql.rstrip().endswith("organizations.name) DESC, organizations.id \n LIMIT %(param_1)s::INTEGER")
+    assert 0.5 in params.values() and 7 in params.values()
+
+
+@pytest.mark.asyncio
+async def test_search_full_text_single_ranked_query():
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().search_full_text(
+        session, "мясная продукция Блюхера", limit=11, after=(0.2, 5),
+    )
+
+    stmt = session.execute.await_args.args[0]
+    sql = compile_sql(stmt)
+    assert session.execute.await_count == 1
+    assert "organizations.search_vector @@ websearch_to_tsquery(" in sql
+    assert "FROM organizations JOIN buildings ON buildings.id = organizations.building_id \nWHERE" in sql
+    assert sql.rstrip().endswith("DESC, organizations.id \n LIMIT %(param_1)s::INTEGER")
+    assert "мясная продукция Блюхера" in stmt.compile().params.values()
+
+
+def test_organization_select_defers_search_columns():
+    from sqlalchemy import select
+    from db.models import Organization
+
+    sql = compile_sql(select(Organization))
+    assert "search_vector" not in sql
+    assert "phone_digits" not in sql and "phone_suffixes" not in sql
+
+
+@pytest.mark.parametrize("phone_match, exact", [("suffix", False), ("exact", True)])
+@pytest.mark.asyncio
+async def test_phone_filter_uses_suffix_array(phone_match, exact):
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().find_all(
+        session, {"phone": "6661313", "phone_match": phone_match}, limit=11,
+    )
+
+    stmt = session.execute.await_args.args[0]
+    sql = compile_sql(stmt)
+    assert "organizations.phone_suffixes @> %(phone_suffixes_1)s::TEXT[]" in sql
+    assert ("organizations.phone_digits @>" in sql) is exact
+    assert ["6661313"] in stmt.compile().params.values()
+
+
+@pytest.mark.asyncio
+async def test_reads_return_rows_without_orm_entities():
+    session = AsyncMock()
+    session.execute.return_value = MagicMock()
+
+    await OrganizationRepository().find_all(session, {"building_id": 1}, limit=101)
+
+    stmt = session.execute.await_args.args[0]
+    sql = compile_sql(stmt)
+    assert all(not description["entity"] or description["expr"] is not description["entity"]
+               for description in stmt.column_descriptions)
+    assert "array_agg(organization_activity.activity_id ORDER BY organization_activity.activity_id)" in sql
+    assert "activities" not in sql.replace("activity_ids", "")
+
+
+def test_cluster_zoom_clamped_to_cell_limit():
+    from schemas.organization import CLUSTER_MAX_CELLS, ClusterRequest
+
+    small = ClusterRequest(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0, zoom=12)
+    world = ClusterRequest(min_lat=-90, max_lat=90, min_lon=-180, max_lon=180, zoom=22)
+
+    assert small.zoom == 12
+    assert world.zoom == 4
+    assert world.cell_count() <= CLUSTER_MAX_CELLS
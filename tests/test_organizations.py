@@ -3,16 +3,26 @@ sys.path.append("src/")
 
 import pytest
 from httpx import AsyncClient
-from schemas.organization import OrganizationResponse
+from pagination import NEXT_CURSOR_HEADER, Page
+from schemas.organization import (
+    CLUSTER_MAX_CELLS,
+    OrganizationResponse,
+    OrganizationDistanceResponse,
+    OrganizationClusterResponse,
+    NearestSearchRequest,
+    RadiusSearchRequest,
+    RectangleSearchRequest,
+    OrganizationSuggestion,
+)
 from schemas.building import BuildingResponse
 from schemas.activity import ActivityResponse
-from exceptions import OrganizationNoFoundException
+from exceptions import OrganizationNoFoundException, InvalidCursorException
 
 
 
 @pytest.mark.asyncio
 async def test_get_organizations_success(client: AsyncClient, mock_org_service):
-    mock_org_service.get_organizations.return_value = [
+    mock_org_service.get_organizations.return_value = Page(items=[
         OrganizationResponse(
             id=1,
             name="Org 1",
@@ -34,7 +44,7 @@ async def test_get_organizations_success(client: AsyncClient, mock_org_service):
                 ActivityResponse(id=2, name="Activity 2", parent_id=None, level=0, children=[])
             ]
         ),
-    ]
+    ])
 
     response = await client.get("/api/v1/organizations?building_id=1&limit=2&offset=0")
     assert response.status_code == 200
@@ -59,10 +69,12 @@ async def test_get_organization_success(client: AsyncClient, mock_org_service):
 
     response = await client.get("/api/v1/organizations/1")
     assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
     data = response.json()
     assert data["id"] == 1
     assert data["name"] == "Org 1"
-    mock_org_service.get_organization.assert_awaited_once_with(1)
+    assert data == mock_org_service.get_organization.return_value.model_dump(mode="json")
+    mock_org_service.get_organization.assert_awaited_once_with(1, 0)
 
 
 @pytest.mark.asyncio
@@ -72,36 +84,80 @@ async def test_get_organization_not_found(client: AsyncClient, mock_org_service)
     response = await client.get("/api/v1/organizations/999")
     assert response.status_code == 404
     assert response.json()["error"] == "organization_not_found"
-    mock_org_service.get_organization.assert_awaited_once_with(999)
+    mock_org_service.get_organization.assert_awaited_once_with(999, 0)
 
 
 @pytest.mark.asyncio
 async def test_get_organizations_within_radius(client: AsyncClient, mock_org_service):
-    mock_org_service.get_organizations_within_radius.return_value = []
+    mock_org_service.get_organizations_within_radius.return_value = Page(items=[])
 
     response = await client.get(
         "/api/v1/organizations/within_radius?latitude=55.75&longitude=37.62&radius_km=10"
     )
     assert response.status_code == 200
     assert response.json() == []
-    mock_org_service.get_organizations_within_radius.assert_awaited_once_with(55.75, 37.62, 10)
+    assert NEXT_CURSOR_HEADER not in response.headers
+    mock_org_service.get_organizations_within_radius.assert_awaited_once_with(
+        RadiusSearchRequest(latitude=55.75, longitude=37.62, radius_km=10)
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_within_radius_by_distance(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations_within_radius.return_value = Page(
+        items=[
+            OrganizationDistanceResponse(
+                id=1,
+                name="Org 1",
+                building_id=1,
+                phone_numbers=[],
+                building=BuildingResponse(id=1, address="Addr 1", latitude=55.75, longitude=37.62),
+                activities=[],
+                distance_km=0.4,
+            )
+        ],
+        next_cursor="next",
+    )
+
+    response = await client.get(
+        "/api/v1/organizations/within_radius?latitude=55.75&longitude=37.62&radius_km=10"
+        "&order_by=distance&limit=1&cursor=prev"
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["distance_km"] == 0.4
+    assert response.headers[NEXT_CURSOR_HEADER] == "next"
+    params = mock_org_service.get_organizations_within_radius.await_args.args[0]
+    assert (params.order_by, params.limit, params.cursor) == ("distance", 1, "prev")
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_within_radius_invalid_cursor(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations_within_radius.side_effect = InvalidCursorException()
+
+    response = await client.get(
+        "/api/v1/organizations/within_radius?latitude=55.75&longitude=37.62&radius_km=10&cursor=bad"
+    )
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_cursor"
 
 
 @pytest.mark.asyncio
 async def test_get_organizations_within_rectangle(client: AsyncClient, mock_org_service):
-    mock_org_service.get_organizations_within_rectangle.return_value = []
+    mock_org_service.get_organizations_within_rectangle.return_value = Page(items=[])
 
     response = await client.get(
         "/api/v1/organizations/within_rectangle?min_lat=55.0&max_lat=56.0&min_lon=37.0&max_lon=38.0"
     )
     assert response.status_code == 200
     assert response.json() == []
-    mock_org_service.get_organizations_within_rectangle.assert_awaited_once_with(55.0, 56.0, 37.0, 38.0)
+    mock_org_service.get_organizations_within_rectangle.assert_awaited_once_with(
+        RectangleSearchRequest(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0)
+    )
 
 
 @pytest.mark.asyncio
 async def test_get_organizations_with_filters(client: AsyncClient, mock_org_service):
-    mock_org_service.get_organizations.return_value = [
+    mock_org_service.get_organizations.return_value = Page(items=[
         OrganizationResponse(
             id=1,
             name="Filtered Org",
@@ -112,7 +168,7 @@ async def test_get_organizations_with_filters(client: AsyncClient, mock_org_serv
                 ActivityResponse(id=2, name="Activity 2", parent_id=None, level=0, children=[])
             ]
         )
-    ]
+    ])
 
     response = await client.get(
         "/api/v1/organizations?building_id=2&activity_id=3&name=Filtered"
@@ -126,7 +182,7 @@ async def test_get_organizations_with_filters(client: AsyncClient, mock_org_serv
 
 @pytest.mark.asyncio
 async def test_pagination(client: AsyncClient, mock_org_service):
-    mock_org_service.get_organizations.return_value = [
+    mock_org_service.get_organizations.return_value = Page(items=[
         OrganizationResponse(
             id=i,
             name=f"Org {i}",
@@ -137,10 +193,139 @@ async def test_pagination(client: AsyncClient, mock_org_service):
                 ActivityResponse(id=2, name="Activity 2", parent_id=None, level=0, children=[])
             ]
         ) for i in range(1, 6)
-    ]
+    ], next_cursor="next")
 
-    response = await client.get("/api/v1/organizations?limit=5&offset=0")
+    response = await client.get("/api/v1/organizations?limit=5&cursor=prev")
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 5
+    assert response.headers[NEXT_CURSOR_HEADER] == "next"
     mock_org_service.get_organizations.assert_awaited_once()
+    assert mock_org_service.get_organizations.await_args.kwargs["cursor"] == "prev"
+
+
+@pytest.mark.asyncio
+async def test_get_nearest_organizations(client: AsyncClient, mock_org_service):
+    mock_org_service.get_nearest_organizations.return_value = []
+
+    response = await client.get("/api/v1/organizations/nearest?latitude=55.75&longitude=37.62&k=3")
+    assert response.status_code == 200
+    assert response.json() == []
+    mock_org_service.get_nearest_organizations.assert_awaited_once_with(
+        NearestSearchRequest(latitude=55.75, longitude=37.62, k=3)
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_organization_clusters(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organization_clusters.return_value = [
+        OrganizationClusterResponse(latitude=55.75, longitude=37.62, count=12, activity_ids=[3, 4])
+    ]
+
+    response = await client.get(
+        "/api/v1/organizations/clusters?min_lat=55.0&max_lat=56.0&min_lon=37.0&max_lon=38.0&zoom=9"
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"latitude": 55.75, "longitude": 37.62, "count": 12, "activity_ids": [3, 4]}]
+    params = mock_org_service.get_organization_clusters.await_args.args[0]
+    assert params.zoom == 9
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_similar_name(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    response = await client.get("/api/v1/organizations?name=Рога%20и%20капыта&name_match=similar")
+    assert response.status_code == 200
+    kwargs = mock_org_service.get_organizations.await_args.kwargs
+    assert kwargs["name_match"] == "similar"
+    assert kwargs["filters"].name == "Рога и капыта"
+
+    response = await client.get("/api/v1/organizations?name=Рога&name_match=fuzzy")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_organizations(client: AsyncClient, mock_org_service):
+    mock_org_service.search_organizations.return_value = Page(items=[
+        OrganizationResponse(
+            id=1,
+            name="Рога и копыта",
+            building_id=1,
+            phone_numbers=[],
+            building=BuildingResponse(id=1, address="г. Москва, ул. Блюхера, 32/1", latitude=55.0, longitude=37.0),
+            activities=[
+                ActivityResponse(id=3, name="Мясная продукция", parent_id=1, level=2, children=[])
+            ]
+        )
+    ], next_cursor="next")
+
+    response = await client.get("/api/v1/organizations/search?q=мясная%20продукция%20Блюхера&limit=1")
+    assert response.status_code == 200
+    assert response.json()[0]["name"] == "Рога и копыта"
+    assert response.headers[NEXT_CURSOR_HEADER] == "next"
+    params = mock_org_service.search_organizations.await_args.args[0]
+    assert (params.q, params.limit) == ("мясная продукция Блюхера", 1)
+
+    response = await client.get("/api/v1/organizations/search?q=")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_suggest_organizations(client: AsyncClient, mock_org_service):
+    mock_org_service.suggest_organizations.return_value = [
+        OrganizationSuggestion(id=1, name="Рога и копыта"),
+    ]
+
+    response = await client.get("/api/v1/organizations/suggest?q=рог&limit=5")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "name": "Рога и копыта"}]
+    params = mock_org_service.suggest_organizations.await_args.args[0]
+    assert (params.q, params.limit) == ("рог", 5)
+
+
+@pytest.mark.asyncio
+async def test_get_organizations_by_phone(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    response = await client.get("/api/v1/organizations?phone=%2B7%20(923)%20666-13-13&phone_match=exact")
+    assert response.status_code == 200
+    filters = mock_org_service.get_organizations.await_args.kwargs["filters"]
+    assert (filters.phone, filters.phone_match) == ("9236661313", "exact")
+
+    # 8 и +7 в начале - один и тот же номер
+    await client.get("/api/v1/organizations?phone=8-923-666-13-13&phone_match=exact")
+    assert mock_org_service.get_organizations.await_args.kwargs["filters"].phone == "9236661313"
+
+    response = await client.get("/api/v1/organizations?phone=13-1")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_activity_depth_param(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    response = await client.get("/api/v1/organizations?activity_depth=2")
+    assert response.status_code == 200
+    assert mock_org_service.get_organizations.await_args.kwargs["activity_depth"] == 2
+
+    response = await client.get("/api/v1/organizations?activity_depth=3")
+    assert response.status_code == 422
+
+    mock_org_service.get_organizations.reset_mock()
+    await client.get("/api/v1/organizations")
+    assert mock_org_service.get_organizations.await_args.kwargs["activity_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_organization_clusters_zoom_clamped(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organization_clusters.return_value = []
+
+    response = await client.get(
+        "/api/v1/organizations/clusters?min_lat=-60&max_lat=60&min_lon=-170&max_lon=170&zoom=15"
+    )
+
+    assert response.status_code == 200
+    params = mock_org_service.get_organization_clusters.await_args.args[0]
+    assert params.zoom < 15
+    assert params.cell_count() <= CLUSTER_MAX_CELLS
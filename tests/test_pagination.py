@@ -0,0 +1,62 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+from exceptions import InvalidCursorException
+from pagination import NEXT_CURSOR_HEADER, Page, encode_cursor, decode_cursor, make_page
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor("distance", [1.2345678901234567, 42])
+
+    assert decode_cursor(cursor, "distance") == (1.2345678901234567, 42)
+    assert decode_cursor(None, "distance") is None
+
+
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor("distance", [1.0, 2]), encode_cursor("id", [])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor, "id")
+
+
+@pytest.mark.parametrize(
+    "order_by, key",
+    [
+        ("similarity", [1]),
+        ("rank", [0.5, 1, 2]),
+        ("distance", [3]),
+        ("distance", ["near", 1]),
+        ("id", ["abc"]),
+        ("id", [1.5]),
+        ("id", [True]),
+        ("similarity", [0.5, "1"]),
+    ],
+)
+def test_malformed_cursor_key(order_by, key):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(encode_cursor(order_by, key), order_by)
+
+
+def test_make_page_cursor_only_when_more_rows():
+    rows = [1, 2, 3]
+
+    full = make_page(rows, 2, "id", key=lambda row: (row,), to_item=str)
+    last = make_page(rows, 3, "id", key=lambda row: (row,), to_item=str)
+
+    assert full.items == ["1", "2"]
+    assert decode_cursor(full.next_cursor, "id") == (2,)
+    assert last.next_cursor is None
+
+
+def test_page_response_serializes_constructed_models():
+    from pydantic import TypeAdapter
+    from typing import List
+    from schemas.building import BuildingResponse
+    from serialization import page_response
+
+    building = BuildingResponse.model_construct(id=1, address="Addr 1", latitude=55.0, longitude=37.0)
+    response = page_response(TypeAdapter(List[BuildingResponse]), Page(items=[building], next_cursor="next"))
+
+    assert response.body == b'[{"address":"Addr 1","latitude":55.0,"longitude":37.0,"id":1}]'
+    assert response.headers[NEXT_CURSOR_HEADER] == "next"
+    assert response.media_type == "application/json"
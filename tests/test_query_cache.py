@@ -0,0 +1,213 @@
+import sys
+sys.path.append("src/")
+
+import fnmatch
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from cache import query_cache as query_cache_module
+from cache.query_cache import SESSION_TAGS_KEY, MemoryBackend, QueryCache, RedisBackend
+from repositories.building import BuildingRepository
+from repositories.organization import OrganizationRepository
+from services.unit_of_work import UnitOfWork
+
+
+class FakeRedis:
+    """Подмножество команд redis.asyncio, которое использует RedisBackend"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in [*self.values, *self.sets]:
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+
+def make_session(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    session = AsyncMock()
+    session.info = {}
+    session.execute.return_value = result
+    return session
+
+
+def make_repository(repository_class, backend):
+    repository = repository_class()
+    repository.cache = QueryCache(backend)
+    return repository
+
+
+async def load(value):
+    return value
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_least_recently_used():
+    cache = QueryCache(MemoryBackend(maxsize=2, ttl=60))
+
+    await cache.get_or_load("ns", {"id": 1}, set(), lambda: load("first"))
+    await cache.get_or_load("ns", {"id": 2}, set(), lambda: load("second"))
+    await cache.get_or_load("ns", {"id": 1}, set(), lambda: load("reloaded"))
+    await cache.get_or_load("ns", {"id": 3}, set(), lambda: load("third"))
+
+    assert len(cache.backend) == 2
+    assert await cache.get_or_load("ns", {"id": 1}, set(), lambda: load("reloaded")) == "first"
+    assert await cache.get_or_load("ns", {"id": 2}, set(), lambda: load("reloaded")) == "reloaded"
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_expires_by_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache_module.time, "monotonic", lambda: now[0])
+    cache = QueryCache(MemoryBackend(maxsize=10, ttl=30))
+
+    await cache.get_or_load("ns", {}, set(), lambda: load("old"))
+    now[0] += 31
+
+    assert await cache.get_or_load("ns", {}, set(), lambda: load("new")) == "new"
+
+
+def test_key_does_not_depend_on_param_order():
+    assert QueryCache.make_key("ns", {"a": 1, "b": {"x": 1, "y": 2}}) == \
+        QueryCache.make_key("ns", {"b": {"y": 2, "x": 1}, "a": 1})
+
+
+@pytest.mark.parametrize("backend", [MemoryBackend(maxsize=10, ttl=60), RedisBackend(FakeRedis(), ttl=60)])
+@pytest.mark.asyncio
+async def test_invalidate_drops_tagged_entries(backend):
+    cache = QueryCache(backend)
+    await cache.get_or_load("ns", {"id": 1}, {"organizations"}, lambda: load([1]), lambda result: {"buildings:5"})
+    await cache.get_or_load("ns", {"id": 2}, {"buildings"}, lambda: load([2]))
+
+    await cache.invalidate({"buildings:5"})
+
+    assert await cache.get_or_load("ns", {"id": 1}, set(), lambda: load("reloaded")) == "reloaded"
+    assert await cache.get_or_load("ns", {"id": 2}, set(), lambda: load("reloaded")) == [2]
+
+
+@pytest.mark.asyncio
+async def test_load_overlapping_invalidation_is_not_stored():
+    cache = QueryCache(MemoryBackend(maxsize=10, ttl=60))
+
+    async def stale_read():
+        # Чтение видело данные до commit, а сброс тегов случился, пока оно шло
+        await cache.invalidate({"buildings:5"})
+        return "stale"
+
+    assert await cache.get_or_load("ns", {}, {"organizations"}, stale_read, lambda result: {"buildings:5"}) == "stale"
+    assert len(cache.backend) == 0
+    assert await cache.get_or_load("ns", {}, {"organizations"}, lambda: load("fresh")) == "fresh"
+    assert await cache.get_or_load("ns", {}, {"organizations"}, lambda: load("again")) == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_clear_discards_loads_in_flight():
+    cache = QueryCache(MemoryBackend(maxsize=10, ttl=60))
+
+    async def read():
+        await cache.clear()
+        return "stale"
+
+    await cache.get_or_load("ns", {}, set(), read)
+    assert len(cache.backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_repository_read_served_from_cache():
+    repository = make_repository(OrganizationRepository, MemoryBackend(maxsize=10, ttl=60))
+    rows = [SimpleNamespace(id=7, building_id=5)]
+    session = make_session(rows)
+
+    first = await repository.find_all(session, {"building_id": 5}, limit=10)
+    second = await repository.find_all(session, filters={"building_id": 5}, limit=10, offset=0)
+    await repository.find_all(session, {"building_id": 6}, limit=10)
+
+    assert first is second
+    assert session.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_geo_read_cached_per_backend(monkeypatch):
+    from config import settings
+
+    repository = make_repository(OrganizationRepository, MemoryBackend(maxsize=10, ttl=60))
+    session = make_session([SimpleNamespace(id=7, building_id=5)])
+    monkeypatch.setattr(settings, "geo_engine", "sql")
+
+    for backend in ("sql", "postgis", "sql"):
+        monkeypatch.setattr(settings, "geo_backend", backend)
+        await repository.find_within_rectangle(session, 55.0, 56.0, 37.0, 38.0)
+
+    assert session.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_write_invalidates_after_commit():
+    backend = MemoryBackend(maxsize=10, ttl=60)
+    organizations = make_repository(OrganizationRepository, backend)
+    buildings = make_repository(BuildingRepository, backend)
+    session = make_session([SimpleNamespace(id=7, building_id=6)])
+    session.execute.return_value.one.return_value = SimpleNamespace(id=8, building_id=5)
+    session.execute.return_value.scalar_one.return_value = SimpleNamespace(id=5)
+
+    await organizations.get_by_id(session, 8)
+    await organizations.find_all(session, {"building_id": 6})
+    await buildings.change_one(session, {"id": 5, "address": "новый адрес"})
+    assert session.info[SESSION_TAGS_KEY] == {"buildings", "buildings:5"}
+
+    uow = UnitOfWork(session)
+    uow.cache = organizations.cache
+    async with uow:
+        pass
+
+    assert SESSION_TAGS_KEY not in session.info
+    # Строка организации несёт адрес здания 5, а страница без него к зданию не привязана
+    session.execute.reset_mock()
+    await organizations.find_all(session, {"building_id": 6})
+    session.execute.assert_not_awaited()
+    await organizations.get_by_id(session, 8)
+    session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_rollback_keeps_cache():
+    repository = make_repository(BuildingRepository, MemoryBackend(maxsize=10, ttl=60))
+    session = make_session([])
+    session.execute.return_value.scalars.return_value.all.return_value = []
+    session.execute.return_value.scalar_one.return_value = SimpleNamespace(id=5)
+
+    await repository.find_all(session)
+    uow = UnitOfWork(session)
+    uow.cache = repository.cache
+    with pytest.raises(RuntimeError):
+        async with uow:
+            await repository.add_one(session, {"address": "адрес"})
+            raise RuntimeError
+
+    assert SESSION_TAGS_KEY not in session.info
+    session.execute.reset_mock()
+    await repository.find_all(session)
+    session.execute.assert_not_awaited()
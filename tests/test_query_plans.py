@@ -0,0 +1,142 @@
+import sys
+sys.path.append("src/")
+
+import hashlib
+import json
+import os
+import pytest
+from sqlalchemy import event, text
+
+from config import settings
+from repositories.building import BuildingRepository
+from repositories.organization import OrganizationRepository
+
+pytestmark = pytest.mark.skipif(
+    "TEST_DATABASE_DSN" not in os.environ,
+    reason="нужен локальный Postgres с применёнными миграциями (TEST_DATABASE_DSN)",
+)
+
+# Таблицы, которые растут вместе с данными: по ним последовательное чтение недопустимо
+LARGE_TABLES = {"buildings", "organizations", "organization_activity", "activity_closure"}
+
+BUILDINGS = 20_000
+ORGANIZATIONS = 100_000
+ROOT_ACTIVITIES = 1_000
+
+SEED = [
+    """
+    INSERT INTO buildings (address, latitude, longitude)
+    SELECT 'plan ' || g, 55 + random() * 2, 37 + random() * 2
+    FROM generate_series(1, :buildings) AS g
+    """,
+    """
+    INSERT INTO activities (name, level)
+    SELECT 'plan ' || g, 1 FROM generate_series(1, :roots) AS g
+    """,
+    """
+    INSERT INTO activities (name, level, parent_id)
+    SELECT 'plan child ' || id, 2, id FROM activities WHERE name LIKE 'plan %'
+    """,
+    """
+    INSERT INTO organizations (name, building_id, phone_numbers)
+    SELECT 'plan ' || md5(g::text), buildings.ids[1 + g % cardinality(buildings.ids)],
+           ARRAY['8-923-' || lpad(g::text, 7, '0')]
+    FROM generate_series(1, :organizations) AS g,
+         (SELECT array_agg(id) AS ids FROM buildings WHERE address LIKE 'plan %') AS buildings
+    """,
+    """
+    INSERT INTO organization_activity (organization_id, activity_id)
+    SELECT organizations.id, activities.ids[1 + (organizations.id + shift) % cardinality(activities.ids)]
+    FROM organizations,
+         (SELECT array_agg(id ORDER BY id) AS ids FROM activities WHERE name LIKE 'plan %') AS activities,
+         (VALUES (0), (7)) AS shifts (shift)
+    WHERE organizations.name LIKE 'plan %'
+    """,
+    "ANALYZE buildings, activities, activity_closure, organizations, organization_activity",
+]
+
+
+def seq_scans(plan: dict) -> set[str]:
+    """Большие таблицы, которые план читает последовательным сканированием"""
+    found = set()
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        found |= seq_scans(child)
+    return found
+
+
+@pytest.fixture
+async def seeded_session(monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    monkeypatch.setattr(settings, "geo_engine", "sql")
+    engine = create_async_engine(os.environ["TEST_DATABASE_DSN"])
+    try:
+        async with AsyncSession(engine) as session:
+            for statement in SEED:
+                await session.execute(text(statement), {
+                    "buildings": BUILDINGS, "roots": ROOT_ACTIVITIES, "organizations": ORGANIZATIONS,
+                })
+            try:
+                yield session
+            finally:
+                await session.rollback()
+    finally:
+        await engine.dispose()
+
+
+async def test_repository_queries_avoid_seq_scans(seeded_session):
+    session = seeded_session
+    plans = []
+
+    # Каждый запрос репозитория (вместе с selectinload) перед выполнением прогоняется через EXPLAIN
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0]
+        plans.append((statement, json.loads(plan) if isinstance(plan, str) else plan))
+
+    building_id, organization_id, root_activity_id = (await session.execute(text("""
+        SELECT
+            (SELECT max(id) FROM buildings),
+            (SELECT max(id) FROM organizations),
+            (SELECT max(id) FROM activities WHERE parent_id IS NULL)
+    """))).one()
+
+    # Уникальное название из сида, в похожем поиске - с опечаткой
+    seed_name = hashlib.md5(b"4242").hexdigest()
+    organizations = OrganizationRepository()
+    queries = {
+        "organizations": lambda: organizations.find_all(session, {}, limit=50, after=(organization_id - 1000,)),
+        "by building": lambda: organizations.find_all(session, {"building_id": building_id}),
+        "by activity": lambda: organizations.find_all(session, {"activity_id": root_activity_id}),
+        "by activity ids": lambda: organizations.find_by_activity_ids(session, [root_activity_id]),
+        "by activity subtree": lambda: organizations.find_by_activity_ids(
+            session, [root_activity_id], include_descendants=True,
+        ),
+        "by name": lambda: organizations.find_all(session, {"name": seed_name[:12]}),
+        "by similar name": lambda: organizations.search_by_name(session, seed_name[:10] + "x" + seed_name[11:], limit=10),
+        "by phone suffix": lambda: organizations.find_all(session, {"phone": "0004242"}),
+        "full text": lambda: organizations.search_full_text(session, seed_name, limit=10),
+        "by id": lambda: organizations.get_by_id(session, organization_id),
+        "within radius": lambda: organizations.find_within_radius(session, 56.0, 38.0, 1, limit=10),
+        "within rectangle": lambda: organizations.find_within_rectangle(
+            session, 55.99, 56.01, 37.99, 38.01, limit=10,
+        ),
+        "buildings": lambda: BuildingRepository().find_all(session, limit=50, after=(building_id - 1000,)),
+    }
+
+    sync_engine = (await session.connection()).engine.sync_engine
+    offenders = {}
+    event.listen(sync_engine, "before_cursor_execute", explain)
+    try:
+        for name, query in queries.items():
+            plans.clear()
+            await query()
+            for statement, plan in plans:
+                if scanned := seq_scans(plan[0]["Plan"]):
+                    offenders.setdefault(name, []).append((sorted(scanned), statement))
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", explain)
+
+    assert not offenders
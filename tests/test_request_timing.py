@@ -0,0 +1,87 @@
+import sys
+sys.path.append("src/")
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+from pagination import Page
+from request_timing import RequestTimings, instrument_engine, request_timings
+from schemas.activity import ActivityResponse
+from schemas.building import BuildingResponse
+
+
+def test_engine_hooks_count_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                connection.execute(text("SELECT 1"))
+            with pytest.raises(Exception):
+                connection.execute(text("SELECT * FROM missing"))
+            assert not connection.info["query_started"]
+    finally:
+        request_timings.reset(token)
+
+    assert timings.queries == 3
+    assert timings.db_seconds > 0
+
+
+def test_engine_hooks_outside_request():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def test_server_timing_format():
+    timings = RequestTimings(queries=4, db_seconds=0.0123, serialize_seconds=0.001)
+
+    assert timings.server_timing(0.02) == \
+        'db;dur=12.30, queries;desc="4", serialize;dur=1.00, total;dur=20.00'
+
+
+@pytest.mark.asyncio
+async def test_response_has_server_timing(client: AsyncClient, mock_org_service):
+    mock_org_service.get_organizations.return_value = Page(items=[])
+
+    response = await client.get("/api/v1/organizations")
+
+    metrics = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert metrics == ["db", "queries", "serialize", "total"]
+
+
+@pytest.mark.parametrize("path, dependency, item", [
+    ("/api/v1/activities", "get_activity_service",
+     ActivityResponse(id=1, name="Еда", parent_id=None, level=1)),
+    ("/api/v1/buildings", "get_building_service",
+     BuildingResponse(id=1, address="Адрес", latitude=55.0, longitude=37.0)),
+])
+@pytest.mark.asyncio
+async def test_list_endpoints_measure_serialization(client: AsyncClient, monkeypatch, path, dependency, item):
+    from unittest.mock import AsyncMock
+    import depends
+    import serialization
+    from main import app
+    from request_timing import measure_serialization
+
+    measured = []
+
+    def spy():
+        measured.append(path)
+        return measure_serialization()
+
+    monkeypatch.setattr(serialization, "measure_serialization", spy)
+    service = AsyncMock()
+    service.get_activities.return_value = service.get_buildings.return_value = Page(items=[item], next_cursor="next")
+    app.dependency_overrides[getattr(depends, dependency)] = lambda: service
+
+    response = await client.get(path)
+
+    assert response.status_code == 200
+    assert response.json() == [item.model_dump(mode="json")]
+    assert response.headers["x-next-cursor"] == "next"
+    assert measured == [path]
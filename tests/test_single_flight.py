@@ -0,0 +1,147 @@
+import sys
+sys.path.append("src/")
+
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from exceptions import ModelNoFoundException, OrganizationNoFoundException
+from schemas.organization import RadiusSearchRequest
+from services.organization import OrganizationService
+from services.single_flight import SingleFlight
+
+ROW = SimpleNamespace(
+    id=1, name="Рога и Копыта", building_id=2, phone_numbers=[], address="Адрес",
+    latitude=55.75, longitude=37.62, activity_ids=[], distance_km=0.5,
+)
+
+
+class FakeSessionMaker:
+    """Сессии общих чтений: запоминаются, чтобы проверить, в какой сессии шёл запрос"""
+
+    def __init__(self):
+        self.sessions = []
+
+    @asynccontextmanager
+    async def __call__(self):
+        session = AsyncMock(closed=False)
+        self.sessions.append(session)
+        try:
+            yield session
+        finally:
+            session.closed = True
+
+
+def make_service(repository) -> OrganizationService:
+    activity_repository = AsyncMock()
+    activity_repository.get_tree.return_value = MagicMock()
+    service = OrganizationService(
+        repository=repository,
+        activity_repository=activity_repository,
+        uow=MagicMock(session=AsyncMock(closed=False)),
+    )
+    service.single_flight = SingleFlight(session_maker=FakeSessionMaker())
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_reads_share_one_query():
+    release = asyncio.Event()
+    repository = AsyncMock()
+
+    async def find_within_radius(*args, **kwargs):
+        await release.wait()
+        return [ROW]
+
+    repository.find_within_radius.side_effect = find_within_radius
+    services = [make_service(repository) for _ in range(50)]
+    flight = services[0].single_flight
+    for service in services:
+        service.single_flight = flight
+
+    params = RadiusSearchRequest(latitude=55.75, longitude=37.62, radius_km=1)
+    tasks = [asyncio.create_task(service.get_organizations_within_radius(params)) for service in services]
+    other = asyncio.create_task(services[0].get_organizations_within_radius(
+        RadiusSearchRequest(latitude=55.75, longitude=37.62, radius_km=2)
+    ))
+    await asyncio.sleep(0)
+    release.set()
+    pages = await asyncio.gather(*tasks, other)
+
+    assert repository.find_within_radius.await_count == 2
+    assert all(page is pages[0] for page in pages[:-1])
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_not_remembered():
+    repository = AsyncMock()
+    repository.get_by_id.side_effect = ModelNoFoundException
+    service = make_service(repository)
+
+    results = await asyncio.gather(
+        service.get_organization(1), service.get_organization(1), return_exceptions=True,
+    )
+
+    assert all(isinstance(result, OrganizationNoFoundException) for result in results)
+    assert repository.get_by_id.await_count == 1
+
+    repository.get_by_id.side_effect = None
+    repository.get_by_id.return_value = ROW
+    assert (await service.get_organization(1)).id == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    release = asyncio.Event()
+    flight = SingleFlight()
+
+    async def load():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flight.do("key", load))
+    second = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "result"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_break_followers():
+    started, release = asyncio.Event(), asyncio.Event()
+    repository = AsyncMock()
+
+    async def get_by_id(session, organization_id):
+        started.set()
+        await release.wait()
+        # Сессия запроса-инициатора к этому моменту закрыта, общее чтение идёт в своей
+        assert session.closed is False
+        return ROW
+
+    repository.get_by_id.side_effect = get_by_id
+    leader, follower = make_service(repository), make_service(repository)
+    follower.single_flight = leader.single_flight
+
+    leader_task = asyncio.create_task(leader.get_organization(1))
+    await started.wait()
+    follower_task = asyncio.create_task(follower.get_organization(1))
+    await asyncio.sleep(0)
+
+    # Клиент инициатора отключился: задача отменена, teardown закрыл его сессию
+    leader_task.cancel()
+    leader.uow.session.closed = True
+    release.set()
+
+    assert (await follower_task).id == 1
+    with pytest.raises(asyncio.CancelledError):
+        await leader_task
+    assert repository.get_by_id.await_count == 1
+    shared_session = leader.single_flight.session_maker.sessions[0]
+    assert repository.get_by_id.await_args.args[0] is shared_session
+    assert shared_session is not leader.uow.session